@@ -0,0 +1 @@
+"""Offline benchmarks for tsync run against local stand-in API servers."""
@@ -0,0 +1,128 @@
+"""
+Benchmark parsing of a Tailscale ``/devices`` response.
+
+Run with ``python -m benchmarks.bench_devices``. A synthetic response body is
+parsed once by loading the whole document with ``json.loads`` (what tsync did
+before streaming) and once by streaming it into compact device records,
+reporting parse time, peak Python memory during the parse and the memory
+still held by the result.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+from tests.fake_servers import FakeState
+from tsync.devices import iter_devices
+from tsync.tailscale import STREAM_CHUNK_SIZE
+
+DEFAULT_SIZES = (1_000, 10_000, 50_000)
+
+
+def build_payload(size: int) -> bytes:
+    """Return a ``/devices`` response body for ``size`` synthetic devices."""
+    state = FakeState()
+    state.seed({"devices": size})
+    return json.dumps({"devices": state.devices}, separators=(",", ":")).encode()
+
+
+def parse_full(payload: bytes) -> List:
+    """Load the whole document and keep the raw device dictionaries."""
+    chunks = [
+        payload[start : start + STREAM_CHUNK_SIZE]
+        for start in range(0, len(payload), STREAM_CHUNK_SIZE)
+    ]
+    return json.loads(b"".join(chunks)).get("devices", [])
+
+
+def parse_streaming(payload: bytes) -> List:
+    """Stream the document into compact device records."""
+    chunks = (
+        payload[start : start + STREAM_CHUNK_SIZE]
+        for start in range(0, len(payload), STREAM_CHUNK_SIZE)
+    )
+    return list(iter_devices(chunks))
+
+
+PARSERS: Dict[str, Callable[[bytes], List]] = {
+    "json.loads": parse_full,
+    "streaming": parse_streaming,
+}
+
+
+def measure(name: str, payload: bytes, size: int) -> Dict[str, object]:
+    """Parse ``payload`` with one parser and collect measurements."""
+    parser = PARSERS[name]
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    devices = parser(payload)
+    elapsed = time.perf_counter() - started
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Time again without tracemalloc, which slows allocation-heavy code.
+    del devices
+    gc.collect()
+    started = time.perf_counter()
+    devices = parser(payload)
+    untraced = time.perf_counter() - started
+
+    return {
+        "parser": name,
+        "devices": size,
+        "payload_mib": round(len(payload) / 2**20, 2),
+        "parse_s": round(untraced, 3),
+        "traced_s": round(elapsed, 3),
+        "peak_mib": round(peak / 2**20, 2),
+        "retained_mib": round(retained / 2**20, 2),
+        "parsed": len(devices),
+    }
+
+
+def format_table(rows: Sequence[Dict[str, object]]) -> str:
+    """Render result rows as an aligned text table."""
+    columns = list(rows[0])
+    widths = {
+        column: max(len(column), *(len(str(row[column])) for row in rows))
+        for column in columns
+    }
+    lines = ["  ".join(column.rjust(widths[column]) for column in columns)]
+    for row in rows:
+        lines.append(
+            "  ".join(str(row[column]).rjust(widths[column]) for column in columns)
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the requested benchmark matrix."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated tailnet sizes (default: %(default)s)",
+    )
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    args = parser.parse_args(argv)
+
+    rows: List[Dict[str, object]] = []
+    for size in (int(size) for size in args.sizes.split(",") if size):
+        payload = build_payload(size)
+        for name in PARSERS:
+            rows.append(measure(name, payload, size))
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(rows, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
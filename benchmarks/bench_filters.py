@@ -0,0 +1,106 @@
+"""
+Benchmark device filter evaluation.
+
+Run with ``python -m benchmarks.bench_filters``. Synthetic devices are parsed
+once, then each filter expression is compiled and evaluated against all of
+them, reporting the cost per device. ``legacy`` reproduces the per-device tag
+lowercasing and list scan tsync used before filters were compiled.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+from tsync.devices import Device, iter_devices
+from tsync.filters import compile_filter
+
+from .bench_devices import build_payload, format_table
+
+DEFAULT_SIZES = (1_000, 50_000)
+EXPRESSIONS = (
+    "",
+    "tag:server",
+    "tag:server -tag:ephemeral",
+    "name:^host1 name:^host2 -name:^host2[0-4]",
+    "tag:server -tag:ephemeral os:linux,windows online authorized -expired",
+    "seen:>30d -tag:ephemeral",
+)
+REPEATS = 5
+
+
+def legacy_predicate(name_pattern: str, tags_filter: List[str]) -> Callable:
+    """Return the pre-compilation filter for a name regex and tag list."""
+    name_regex = re.compile(name_pattern)
+
+    def matches(device: Device) -> bool:
+        if not name_regex.match(device.hostname):
+            return False
+        device_tags = [tag.lower() for tag in device.tags]
+        return any(tag.lower() in device_tags for tag in tags_filter)
+
+    return matches
+
+
+def measure(
+    name: str,
+    predicate: Callable[[Device], bool],
+    devices: List[Device],
+) -> Dict[str, object]:
+    """Evaluate ``predicate`` over ``devices`` and report the best timing."""
+    best = float("inf")
+    matched = 0
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        matched = sum(1 for device in devices if predicate(device))
+        best = min(best, time.perf_counter() - started)
+    return {
+        "filter": name or "(none)",
+        "devices": len(devices),
+        "matched": matched,
+        "total_ms": round(best * 1000, 2),
+        "ns_per_device": round(best / max(len(devices), 1) * 1e9),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the requested benchmark matrix."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated tailnet sizes (default: %(default)s)",
+    )
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    args = parser.parse_args(argv)
+
+    rows: List[Dict[str, object]] = []
+    for size in (int(size) for size in args.sizes.split(",") if size):
+        devices = list(iter_devices([build_payload(size)]))
+        row = measure(
+            "legacy name:.* tag:server",
+            legacy_predicate(".*", ["tag:server"]),
+            devices,
+        )
+        row["compile_ms"] = "-"
+        rows.append(row)
+        for expression in EXPRESSIONS:
+            started = time.perf_counter()
+            predicate = compile_filter(expression).predicate()
+            compile_ms = (time.perf_counter() - started) * 1000
+            row = measure(expression, predicate, devices)
+            row["compile_ms"] = round(compile_ms, 3)
+            rows.append(row)
+
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(rows, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,195 @@
+"""
+Benchmark DNSSync.sync end to end against the local fake APIs.
+
+Run with ``python -m benchmarks.bench_sync``. Each scenario seeds a synthetic
+tailnet and zone, runs one sync and reports wall time, request count, bytes
+transferred and peak Python memory of the sync process.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from typing import Dict, List, Optional, Sequence
+
+from tests.fake_servers import FakeServers
+from tsync.cloudflare import DEFAULT_BATCH_SIZE, CloudflareAPI
+from tsync.sync import DNSSync
+from tsync.tailscale import TailscaleAPI
+from tsync.transport import HTTPTransport
+
+BASE_DOMAIN = "ts.example.com"
+DEFAULT_SIZES = (10, 1_000, 10_000, 50_000)
+# Far outside any synthetic tailnet, so every renumbered address differs.
+RENUMBER_OFFSET = 1_000_000
+SCENARIOS = ("create", "noop", "renumber")
+
+
+def scenario_spec(scenario: str, size: int) -> Dict[str, object]:
+    """Describe the seeded tailnet and zone for a scenario."""
+    if scenario == "create":
+        return {"devices": size, "records": 0}
+    if scenario == "noop":
+        return {"devices": size, "records": size}
+    if scenario == "renumber":
+        return {"devices": size, "records": size, "device_ip_offset": RENUMBER_OFFSET}
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def run_scenario(
+    servers: FakeServers,
+    scenario: str,
+    size: int,
+    args: argparse.Namespace,
+) -> Dict[str, object]:
+    """Seed the fakes, run one sync and collect measurements."""
+    servers.seed(
+        base_domain=BASE_DOMAIN,
+        wildcards=True,
+        latency=args.latency,
+        rate_limit_every=args.rate_limit_every,
+        noise_records=args.noise_records,
+        **scenario_spec(scenario, size),
+    )
+
+    transport = HTTPTransport(backoff_base=0.01, pool_size=max(10, args.concurrency))
+    tailscale_api = TailscaleAPI("bench", "bench.example.com", transport=transport)
+    tailscale_api.base_url = servers.tailscale_url
+    cloudflare_api = CloudflareAPI(
+        "bench",
+        "bench-zone",
+        "example.com",
+        base_domain=BASE_DOMAIN,
+        create_wildcard_records=True,
+        batch_size=args.batch_size,
+        transport=transport,
+    )
+    cloudflare_api.base_url = servers.cloudflare_url
+    dns_sync = DNSSync(tailscale_api, cloudflare_api, concurrency=args.concurrency)
+
+    if args.memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    created, updated, deleted = dns_sync.sync()
+    wall = time.perf_counter() - started
+    peak = 0
+    if args.memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    stats = servers.stats()
+    transport.close()
+    return {
+        "scenario": scenario,
+        "devices": size,
+        "wall_s": round(wall, 3),
+        "requests": stats["requests"],
+        "throttled": stats["throttled"],
+        "bytes_in": stats["bytes_in"],
+        "bytes_out": stats["bytes_out"],
+        "peak_mib": round(peak / 2**20, 2),
+        "created": created,
+        "updated": updated,
+        "deleted": deleted,
+    }
+
+
+def format_table(rows: Sequence[Dict[str, object]]) -> str:
+    """Render result rows as an aligned text table."""
+    columns = [
+        "scenario",
+        "devices",
+        "wall_s",
+        "requests",
+        "throttled",
+        "bytes_in",
+        "bytes_out",
+        "peak_mib",
+        "created",
+        "updated",
+        "deleted",
+    ]
+    widths = {
+        column: max(len(column), *(len(str(row[column])) for row in rows))
+        for column in columns
+    }
+    lines = ["  ".join(column.rjust(widths[column]) for column in columns)]
+    for row in rows:
+        lines.append(
+            "  ".join(str(row[column]).rjust(widths[column]) for column in columns)
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    """Parse benchmark options."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated tailnet sizes (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="Comma-separated scenarios: create, noop, renumber",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds added to every API response",
+    )
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Answer every Nth API request with HTTP 429",
+    )
+    parser.add_argument(
+        "--noise-records",
+        type=int,
+        default=0,
+        help="Unrelated records in the zone outside the base domain",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="Skip tracemalloc, which slows the sync down noticeably",
+    )
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the requested benchmark matrix."""
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    rows: List[Dict[str, object]] = []
+
+    with FakeServers() as servers:
+        for size in sizes:
+            for scenario in scenarios:
+                rows.append(run_scenario(servers, scenario, size, args))
+                print(format_table(rows[-1:]).splitlines()[-1], flush=True)
+
+    print()
+    print(format_table(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(rows, handle, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
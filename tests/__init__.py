@@ -0,0 +1 @@
+"""Tests for tsync, run against local stand-in API servers."""
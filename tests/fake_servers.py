@@ -0,0 +1,395 @@
+"""Local stand-ins for the Tailscale and Cloudflare APIs for tests and benchmarks."""
+
+from __future__ import annotations
+
+import ipaddress
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+TAILSCALE_PREFIX = "/api/v2"
+CLOUDFLARE_PREFIX = "/client/v4"
+FIRST_IP = int(ipaddress.IPv4Address("100.64.0.1"))
+
+
+def device_ip(index: int, offset: int = 0) -> str:
+    """Return a deterministic CGNAT address for device ``index``."""
+    return str(ipaddress.IPv4Address(FIRST_IP + index + offset))
+
+
+def _device_tags(index: int) -> List[str]:
+    """Return a deterministic mix of tags for device ``index``."""
+    tags = ["tag:server"] if index % 2 == 0 else ["tag:client"]
+    if index % 7 == 0:
+        tags.append("tag:ephemeral")
+    return tags
+
+
+class FakeState:
+    """In-memory tailnet and zone shared by the request handlers."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.devices: List[Dict] = []
+        self.records: Dict[str, Dict] = {}
+        self.latency = 0.0
+        self.rate_limit_every = 0
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.throttled = 0
+
+    def seed(self, spec: Dict) -> None:
+        """Replace the tailnet and zone with synthetic data described by ``spec``."""
+        count = int(spec.get("devices", 0))
+        base_domain = spec.get("base_domain", "ts.example.com")
+        device_offset = int(spec.get("device_ip_offset", 0))
+        record_offset = int(spec.get("record_ip_offset", 0))
+
+        self.devices = [
+            {
+                "id": str(index),
+                "nodeId": f"n{index}",
+                "name": f"host{index}.tailnet.ts.net",
+                "hostname": f"host{index}",
+                "addresses": [
+                    device_ip(index, device_offset),
+                    f"fd7a:115c::{index:x}",
+                ],
+                "tags": _device_tags(index),
+                "os": ("linux", "windows", "macOS", "iOS")[index % 4],
+                "online": index % 5 != 0,
+                "authorized": index % 50 != 0,
+                "keyExpiryDisabled": index % 3 != 0,
+                "expires": "2030-01-01T00:00:00Z",
+                "lastSeen": f"2024-01-{index % 28 + 1:02d}T00:00:00Z",
+                "clientVersion": "1.60.0",
+                "user": "bench@example.com",
+                "machineKey": "mkey:" + "0" * 64,
+                "nodeKey": "nodekey:" + "0" * 64,
+            }
+            for index in range(count)
+        ]
+
+        self.records = {}
+        for index in range(int(spec.get("records", 0))):
+            name = f"host{index}.{base_domain}"
+            content = device_ip(index, record_offset)
+            self._add_record({"type": "A", "name": name, "content": content})
+            if spec.get("wildcards", True):
+                self._add_record({"type": "A", "name": f"*.{name}", "content": content})
+        for index in range(int(spec.get("noise_records", 0))):
+            name = f"other{index}.example.net"
+            self._add_record({"type": "A", "name": name, "content": "192.0.2.1"})
+
+        self.latency = float(spec.get("latency", 0.0))
+        self.rate_limit_every = int(spec.get("rate_limit_every", 0))
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        """Zero the request counters."""
+        self.requests = self.bytes_in = self.bytes_out = self.throttled = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return request counters and the current record count."""
+        return {
+            "requests": self.requests,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "throttled": self.throttled,
+            "records": len(self.records),
+        }
+
+    def _add_record(self, record: Dict) -> Dict:
+        record = {"id": uuid.uuid4().hex, "ttl": 300, "proxied": False, **record}
+        self.records[record["id"]] = record
+        return record
+
+
+class FakeAPIHandler(BaseHTTPRequestHandler):
+    """Serve the subset of both APIs that tsync calls."""
+
+    protocol_version = "HTTP/1.1"
+    state: FakeState
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        return
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._dispatch("POST")
+
+    def do_PUT(self) -> None:  # noqa: N802
+        self._dispatch("PUT")
+
+    def do_PATCH(self) -> None:  # noqa: N802
+        self._dispatch("PATCH")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str) -> None:
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        body = json.loads(raw) if raw else None
+        state = self.state
+
+        if url.path.startswith("/_control/"):
+            self._control(url.path, body)
+            return
+
+        with state.lock:
+            state.requests += 1
+            state.bytes_in += length + len(self.path)
+            throttle = (
+                state.rate_limit_every
+                and state.requests % state.rate_limit_every == 0
+            )
+            if throttle:
+                state.throttled += 1
+
+        if state.latency:
+            time.sleep(state.latency)
+        if throttle:
+            self._send(
+                429,
+                {"success": False, "errors": [{"code": 10000}]},
+                {"Retry-After": "0"},
+            )
+            return
+
+        if url.path.startswith(TAILSCALE_PREFIX):
+            self._tailscale(method, url.path[len(TAILSCALE_PREFIX) :])
+        elif url.path.startswith(CLOUDFLARE_PREFIX):
+            self._cloudflare(
+                method,
+                url.path[len(CLOUDFLARE_PREFIX) :],
+                parse_qs(url.query),
+                body,
+            )
+        else:
+            self._send(404, {"message": "not found"})
+
+    def _tailscale(self, method: str, path: str) -> None:
+        parts = path.strip("/").split("/")
+        if method == "GET" and parts[-1] == "devices":
+            self._send(200, {"devices": self.state.devices})
+            return
+        if method == "GET" and len(parts) == 2 and parts[0] == "device":
+            for device in self.state.devices:
+                if parts[1] in (device["id"], device["nodeId"]):
+                    self._send(200, device)
+                    return
+        self._send(404, {"message": "not found"})
+
+    def _cloudflare(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, List[str]],
+        body: Optional[Dict],
+    ) -> None:
+        parts = path.strip("/").split("/")
+        if len(parts) < 3 or parts[0] != "zones" or parts[2] != "dns_records":
+            self._send(404, {"success": False})
+            return
+
+        records = self.state.records
+        with self.state.lock:
+            if len(parts) == 3 and method == "GET":
+                self._list(query)
+            elif len(parts) == 3 and method == "POST":
+                self._ok(self.state._add_record(body or {}))
+            elif len(parts) == 4 and parts[3] == "batch" and method == "POST":
+                self._batch(body or {})
+            elif len(parts) == 4 and parts[3] in records:
+                record_id = parts[3]
+                if method == "DELETE":
+                    records.pop(record_id)
+                    self._ok({"id": record_id})
+                elif method in ("PUT", "PATCH"):
+                    if method == "PUT":
+                        records[record_id] = {"id": record_id, **(body or {})}
+                    else:
+                        records[record_id].update(body or {})
+                    self._ok(records[record_id])
+                else:
+                    self._ok(records[record_id])
+            else:
+                self._send(404, {"success": False, "errors": [{"code": 81044}]})
+
+    def _list(self, query: Dict[str, List[str]]) -> None:
+        def arg(name: str) -> Optional[str]:
+            values = query.get(name)
+            return values[0] if values else None
+
+        types = set((arg("type") or "").split(",")) - {""}
+        suffix = arg("name.endswith")
+        exact = arg("name.exact") or arg("name")
+        comment = arg("comment.exact")
+        matches = [
+            record
+            for record in self.state.records.values()
+            if (not types or record["type"] in types)
+            and (suffix is None or record["name"].endswith(suffix))
+            and (exact is None or record["name"] == exact)
+            and (comment is None or record.get("comment") == comment)
+        ]
+
+        per_page = int(arg("per_page") or 100)
+        page = int(arg("page") or 1)
+        total_pages = max((len(matches) + per_page - 1) // per_page, 1)
+        result = matches[(page - 1) * per_page : page * per_page]
+        self._send(
+            200,
+            {
+                "success": True,
+                "result": result,
+                "result_info": {
+                    "page": page,
+                    "per_page": per_page,
+                    "count": len(result),
+                    "total_count": len(matches),
+                    "total_pages": total_pages,
+                },
+            },
+        )
+
+    def _batch(self, body: Dict) -> None:
+        records = self.state.records
+        missing = [
+            item["id"]
+            for key in ("deletes", "patches", "puts")
+            for item in body.get(key, [])
+            if item["id"] not in records
+        ]
+        if missing:
+            self._send(404, {"success": False, "errors": [{"code": 81044}]})
+            return
+
+        result: Dict[str, List[Dict]] = {
+            "deletes": [],
+            "patches": [],
+            "puts": [],
+            "posts": [],
+        }
+        for item in body.get("deletes", []):
+            result["deletes"].append(records.pop(item["id"]))
+        for item in body.get("patches", []):
+            records[item["id"]].update(item)
+            result["patches"].append(records[item["id"]])
+        for item in body.get("puts", []):
+            records[item["id"]] = dict(item)
+            result["puts"].append(records[item["id"]])
+        for item in body.get("posts", []):
+            result["posts"].append(self.state._add_record(item))
+        self._ok(result)
+
+    def _control(self, path: str, body: Optional[Dict]) -> None:
+        with self.state.lock:
+            if path == "/_control/seed":
+                self.state.seed(body or {})
+            elif path == "/_control/reset":
+                self.state.reset_stats()
+            self._send(200, self.state.stats())
+
+    def _ok(self, result: object) -> None:
+        self._send(
+            200,
+            {"success": True, "errors": [], "messages": [], "result": result},
+        )
+
+    def _send(
+        self,
+        status: int,
+        payload: object,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        self.state.bytes_out += len(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port_queue: "multiprocessing.Queue[int]", host: str = "127.0.0.1") -> None:
+    """Run the fake APIs until the process is terminated."""
+    handler = type("Handler", (FakeAPIHandler,), {"state": FakeState()})
+    httpd = ThreadingHTTPServer((host, 0), handler)
+    httpd.daemon_threads = True
+    port_queue.put(httpd.server_address[1])
+    httpd.serve_forever()
+
+
+class FakeServers:
+    """
+    Run the fake APIs in a child process.
+
+    Keeping the servers out of the benchmark process means wall time and
+    peak memory measure tsync alone. Use as a context manager.
+    """
+
+    def __init__(self) -> None:
+        self._process: Optional[multiprocessing.Process] = None
+        self.url = ""
+
+    def __enter__(self) -> "FakeServers":
+        port_queue: "multiprocessing.Queue[int]" = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=serve,
+            args=(port_queue,),
+            daemon=True,
+        )
+        self._process.start()
+        self.url = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+
+    @property
+    def tailscale_url(self) -> str:
+        """Base URL to assign to ``TailscaleAPI.base_url``."""
+        return self.url + TAILSCALE_PREFIX
+
+    @property
+    def cloudflare_url(self) -> str:
+        """Base URL to assign to ``CloudflareAPI.base_url``."""
+        return self.url + CLOUDFLARE_PREFIX
+
+    def seed(self, **spec: object) -> Dict[str, int]:
+        """Load synthetic devices and records into the fakes."""
+        return self._control("seed", spec)
+
+    def reset_stats(self) -> Dict[str, int]:
+        """Zero the request counters."""
+        return self._control("reset", {})
+
+    def stats(self) -> Dict[str, int]:
+        """Return request counters without resetting them."""
+        return self._control("stats", {})
+
+    def _control(self, action: str, payload: Dict) -> Dict[str, int]:
+        response = requests.post(
+            f"{self.url}/_control/{action}",
+            json=payload,
+            timeout=120,
+        )
+        response.raise_for_status()
+        return response.json()
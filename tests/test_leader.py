@@ -0,0 +1,99 @@
+"""Cloudflare lease election against the fake Cloudflare API."""
+
+from __future__ import annotations
+
+import time
+import unittest
+
+from tsync.cloudflare import CloudflareAPI
+from tsync.leader import CloudflareLeaseElector, _holder
+from tsync.transport import HTTPTransport
+
+from .fake_servers import FakeServers
+
+BASE_DOMAIN = "ts.example.com"
+LEASE = 0.3
+
+
+class CloudflareLeaseTest(unittest.TestCase):
+    """Two replicas sharing one lease record in the fake zone."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.servers = FakeServers().__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.servers.__exit__(None, None, None)
+
+    def setUp(self) -> None:
+        self.servers.seed(devices=0, records=0)
+        self.cloudflare = CloudflareAPI(
+            "token",
+            "zone",
+            "example.com",
+            BASE_DOMAIN,
+            transport=HTTPTransport(max_retries=0),
+        )
+        self.cloudflare.base_url = self.servers.cloudflare_url
+
+    def elector(self, holder: str) -> CloudflareLeaseElector:
+        return CloudflareLeaseElector(
+            self.cloudflare,
+            holder_id=holder,
+            lease_seconds=LEASE,
+        )
+
+    def lease_records(self):
+        return self.cloudflare.find_dns_records(
+            f"_tsync-leader.{BASE_DOMAIN}",
+            "TXT",
+        )
+
+    def test_standby_takes_over_an_expired_lease(self) -> None:
+        first, second = self.elector("first"), self.elector("second")
+
+        self.assertTrue(first.poll())
+        self.assertFalse(second.poll())
+        self.assertEqual(second.leader, "first")
+
+        # Renewals change the record, so the standby keeps waiting.
+        time.sleep(LEASE / 2)
+        self.assertTrue(first.poll())
+        time.sleep(LEASE / 2)
+        self.assertFalse(second.poll())
+
+        # Without renewals the lease runs out and the standby takes over.
+        time.sleep(LEASE * 1.5)
+        self.assertTrue(second.poll())
+        self.assertFalse(first.poll())
+        self.assertEqual(first.leader, "second")
+        self.assertEqual(len(self.lease_records()), 1)
+
+    def test_concurrent_leases_settle_on_the_oldest_record(self) -> None:
+        first, second = self.elector("first"), self.elector("second")
+        for holder in ("first", "second"):
+            self.cloudflare.create_dns_record(
+                f"_tsync-leader.{BASE_DOMAIN}",
+                f"holder={holder} renewed=0",
+                "TXT",
+            )
+        winner = _holder(first._records()[0])
+        loser = second if winner == "first" else first
+
+        self.assertFalse(loser._settle())
+        self.assertEqual(loser.leader, winner)
+        records = self.lease_records()
+        self.assertEqual(len(records), 1)
+        self.assertIn(f"holder={winner} ", records[0]["content"])
+
+    def test_stop_releases_the_lease(self) -> None:
+        first = self.elector("first")
+        self.assertTrue(first.poll())
+        first.stop()
+        self.assertFalse(first.is_leader)
+        self.assertEqual(self.lease_records(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+"""Webhook signature checks and deliveries to a local WebhookServer."""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import queue
+import time
+import unittest
+from typing import Optional
+
+import requests
+
+from tsync.cli import _event_matches
+from tsync.webhook import (
+    SIGNATURE_HEADER,
+    DeviceEvent,
+    WebhookServer,
+    parse_events,
+    verify_signature,
+)
+
+SECRET = "whsec-test"
+BODY = json.dumps(
+    [
+        {
+            "type": "nodeCreated",
+            "tailnet": "example.com",
+            "data": {"nodeID": "n1", "deviceName": "web1.tailnet.ts.net"},
+        },
+        {"type": "nodeDeleted", "data": {"nodeId": "n2"}},
+        {"type": "policyUpdate", "data": {}},
+    ]
+).encode("utf-8")
+
+
+def sign(body: bytes, secret: str = SECRET, timestamp: Optional[int] = None) -> str:
+    """Return a signature header the way Tailscale computes it."""
+    stamp = str(int(time.time()) if timestamp is None else timestamp)
+    digest = hmac.new(
+        secret.encode("utf-8"),
+        stamp.encode("utf-8") + b"." + body,
+        hashlib.sha256,
+    ).hexdigest()
+    return f"t={stamp},v1={digest}"
+
+
+class VerifySignatureTest(unittest.TestCase):
+    def test_valid_signature(self) -> None:
+        self.assertTrue(verify_signature(SECRET, sign(BODY), BODY))
+
+    def test_stale_signature(self) -> None:
+        header = sign(BODY, timestamp=int(time.time()) - 600)
+        self.assertFalse(verify_signature(SECRET, header, BODY))
+        self.assertTrue(verify_signature(SECRET, header, BODY, tolerance=900))
+
+    def test_forged_signature(self) -> None:
+        self.assertFalse(verify_signature(SECRET, sign(BODY, "other"), BODY))
+        self.assertFalse(verify_signature(SECRET, sign(BODY), BODY + b" "))
+        self.assertFalse(verify_signature(SECRET, "t=1,v1=", BODY))
+        self.assertFalse(verify_signature(SECRET, None, BODY))
+
+
+class ParseEventsTest(unittest.TestCase):
+    def test_keeps_device_events(self) -> None:
+        self.assertEqual(
+            parse_events(BODY),
+            [
+                DeviceEvent("nodeCreated", "n1", "web1.tailnet.ts.net", "example.com"),
+                DeviceEvent("nodeDeleted", "n2", None),
+            ],
+        )
+        self.assertTrue(parse_events(BODY)[1].deleted)
+
+    def test_single_event_object(self) -> None:
+        body = b'{"type": "nodeApproved", "data": {"nodeID": "n3"}}'
+        self.assertEqual([event.device_id for event in parse_events(body)], ["n3"])
+
+
+class EventMatchesTest(unittest.TestCase):
+    def test_named_tailnet(self) -> None:
+        event = DeviceEvent("nodeCreated", "n1", None, tailnet="example.com")
+        self.assertTrue(_event_matches(event, "example.com", 2))
+        self.assertFalse(_event_matches(event, "other.com", 2))
+
+    def test_default_alias_matches_only_a_single_target(self) -> None:
+        event = DeviceEvent("nodeCreated", "n1", None, tailnet="example.com")
+        self.assertTrue(_event_matches(event, "-", 1))
+        self.assertFalse(_event_matches(event, "-", 2))
+
+
+class WebhookServerTest(unittest.TestCase):
+    """Deliveries posted over HTTP to a server on a free local port."""
+
+    def setUp(self) -> None:
+        self.events: "queue.Queue[DeviceEvent]" = queue.Queue()
+        self.server = WebhookServer(
+            ["unused", SECRET],
+            self.events.put,
+            host="127.0.0.1",
+            port=0,
+        )
+        self.server.start()
+        host, port = self.server.server_address
+        self.url = f"http://{host}:{port}/"
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def post(self, body: bytes, header: Optional[str]) -> int:
+        headers = {SIGNATURE_HEADER: header} if header else {}
+        response = requests.post(self.url, data=body, headers=headers, timeout=5)
+        return response.status_code
+
+    def test_signed_delivery_queues_events(self) -> None:
+        self.assertEqual(self.post(BODY, sign(BODY)), 200)
+        received = [self.events.get(timeout=5).device_id for _ in range(2)]
+        self.assertEqual(received, ["n1", "n2"])
+
+    def test_stale_and_forged_deliveries_are_rejected(self) -> None:
+        stale = sign(BODY, timestamp=int(time.time()) - 600)
+        self.assertEqual(self.post(BODY, stale), 401)
+        self.assertEqual(self.post(BODY, sign(BODY, "other")), 401)
+        self.assertEqual(self.post(BODY, None), 401)
+        self.assertTrue(self.events.empty())
+
+    def test_malformed_payload_is_rejected(self) -> None:
+        body = b"not json"
+        self.assertEqual(self.post(body, sign(body)), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,13 +2,14 @@
 
 from .cli import main  # noqa: F401
 from .cloudflare import CloudflareAPI  # noqa: F401
-from .notifications import NotificationService  # noqa: F401
+from .notifications import NotificationQueue, NotificationService  # noqa: F401
 from .sync import DNSSync  # noqa: F401
 from .tailscale import TailscaleAPI  # noqa: F401
 
 __all__ = [
     "CloudflareAPI",
     "DNSSync",
+    "NotificationQueue",
     "NotificationService",
     "TailscaleAPI",
     "main",
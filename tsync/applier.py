@@ -0,0 +1,108 @@
+"""Apply stage executing planned DNS changes against Cloudflare."""
+
+from __future__ import annotations
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from .cloudflare import ChangeResult, CloudflareAPI, RecordChange
+from .plan import SyncPlan
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ApplyResult:
+    """Outcome of applying a plan."""
+
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
+    results: List[ChangeResult] = field(default_factory=list)
+
+    @property
+    def counts(self) -> Tuple[int, int, int]:
+        """Return the created/updated/deleted tallies."""
+        return self.created, self.updated, self.deleted
+
+
+class PlanApplier:
+    """Execute a SyncPlan through the batch or per-record endpoints."""
+
+    def __init__(self, cloudflare_api: CloudflareAPI, concurrency: int = 1) -> None:
+        self.cloudflare = cloudflare_api
+        self.concurrency = max(concurrency, 1)
+
+    def apply(self, plan: SyncPlan, dry_run: bool = False) -> ApplyResult:
+        """Apply every change in ``plan`` and tally the outcome."""
+        changes = plan.changes
+        for change in changes:
+            log_change(change)
+
+        if dry_run:
+            results = [(change, True) for change in changes]
+        else:
+            results = self.cloudflare.apply_changes(
+                changes,
+                fallback=self._apply_concurrently if self.concurrency > 1 else None,
+            )
+
+        outcome = ApplyResult(results=results)
+        for change, ok in results:
+            if not ok:
+                outcome.failed += 1
+            elif change.action == "create":
+                outcome.created += 1
+            elif change.action == "update":
+                outcome.updated += 1
+            elif change.action == "delete":
+                outcome.deleted += 1
+
+        return outcome
+
+    def _apply_concurrently(
+        self,
+        changes: Sequence[RecordChange],
+    ) -> List[ChangeResult]:
+        """
+        Apply per-record changes through a bounded worker pool.
+
+        Changes are grouped by hostname so a record and its wildcard are
+        applied in order by a single worker, while different hostnames run in
+        parallel. Results are returned in the original order.
+        """
+        groups: Dict[str, List[int]] = {}
+        for index, change in enumerate(changes):
+            hostname = change.name[2:] if change.name.startswith("*.") else change.name
+            groups.setdefault(hostname, []).append(index)
+
+        def apply_group(indexes: List[int]) -> List[Tuple[int, bool]]:
+            return [(i, self.cloudflare.apply_change(changes[i])) for i in indexes]
+
+        outcomes: Dict[int, bool] = {}
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="tsync-apply",
+        ) as executor:
+            for group in executor.map(apply_group, groups.values()):
+                outcomes.update(group)
+
+        return [(change, outcomes[i]) for i, change in enumerate(changes)]
+
+
+def log_change(change: RecordChange) -> None:
+    """Log a planned change before it is applied."""
+    if change.action == "create":
+        logger.info("Creating DNS record for %s -> %s", change.name, change.content)
+    elif change.action == "update":
+        logger.info(
+            "Updating %s: %s -> %s",
+            change.name,
+            change.previous_content,
+            change.content,
+        )
+    else:
+        logger.info("Deleting DNS record %s", change.name)
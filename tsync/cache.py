@@ -0,0 +1,142 @@
+"""Record index kept across sync cycles and persisted between runs."""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+from .cloudflare import ChangeResult
+from .plan import CurrentRecord, RecordIndex, RecordKey
+from .state import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+
+class RecordCache:
+    """
+    Managed records by (name, type), kept current by tsync's own writes.
+
+    A full listing replaces the contents; afterwards every successful
+    create, update and delete is written through, so later cycles can plan
+    against the cache instead of listing the zone again. ``scope`` names the
+    settings the records were listed under, and a saved cache with another
+    scope is ignored. A cache becomes stale, forcing the next listing, when
+    a write reveals that it was wrong or a created record's ID is unknown.
+    """
+
+    def __init__(self, scope: str, path: Optional[str] = None) -> None:
+        self.scope = scope
+        self.path = path
+        self.records: Dict[RecordKey, CurrentRecord] = {}
+        self.listed_at = 0.0
+        self.cycles = 0
+        self.stale = True
+
+    @classmethod
+    def load(cls, scope: str, path: str) -> "RecordCache":
+        """Read the cache at ``path``, starting cold if unusable."""
+        cache = cls(scope, path)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return cache
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable record cache %s: %s", path, exc)
+            return cache
+
+        if data.get("scope") != scope:
+            logger.info("Record cache %s was built for other settings", path)
+            return cache
+        try:
+            cache.records = {
+                (name, record_type): CurrentRecord(record_id, content, bool(owned))
+                for name, record_type, record_id, content, owned in data["records"]
+            }
+            cache.listed_at = float(data["listed_at"])
+            cache.cycles = int(data.get("cycles", 0))
+        except (KeyError, TypeError, ValueError) as exc:
+            logger.warning("Ignoring malformed record cache %s: %s", path, exc)
+            cache.records = {}
+            return cache
+        cache.stale = False
+        logger.info("Loaded %s cached records from %s", len(cache.records), path)
+        return cache
+
+    def save(self) -> None:
+        """Atomically write the cache to its path, if it has one."""
+        if self.path is None:
+            return
+        write_json_atomic(
+            self.path,
+            {
+                "scope": self.scope,
+                "listed_at": self.listed_at,
+                "cycles": self.cycles,
+                "records": [
+                    [name, record_type, record.record_id, record.content, record.owned]
+                    for (name, record_type), record in self.records.items()
+                ],
+            }
+            if not self.stale
+            else {"scope": self.scope, "listed_at": 0, "records": []},
+        )
+
+    def age(self) -> float:
+        """Return seconds since the records were last listed."""
+        return time.time() - self.listed_at
+
+    def replace(self, index: RecordIndex) -> None:
+        """Take over the records of a fresh full listing."""
+        self.records = dict(index.records)
+        self.listed_at = time.time()
+        self.cycles = 0
+        self.stale = False
+
+    def fill(self, index: RecordIndex) -> RecordIndex:
+        """Add the cached records to ``index`` and return it."""
+        for (name, record_type), record in self.records.items():
+            index.add(name, record_type, record.record_id, record.content, record.owned)
+        return index
+
+    def update(
+        self,
+        results: Iterable[ChangeResult],
+        created_ids: Mapping[Tuple[str, str], str],
+    ) -> bool:
+        """
+        Write successful changes through; return whether the cache changed.
+
+        ``created_ids`` maps (name, type) to the IDs of created records.
+        """
+        if self.stale:
+            return False
+        changed = False
+        for change, ok in results:
+            if not ok:
+                continue
+            key = (change.name, change.record_type)
+            if change.action == "create":
+                record_id = created_ids.get(key)
+                if record_id is None:
+                    self.invalidate(f"no ID was returned for {change.name}")
+                    return True
+                self.records[key] = CurrentRecord(record_id, change.content)
+            elif change.action == "update" and change.record_id:
+                self.records[key] = CurrentRecord(change.record_id, change.content)
+            else:
+                current = self.records.get(key)
+                if current is None or current.record_id != change.record_id:
+                    continue
+                del self.records[key]
+            changed = True
+        return changed
+
+    def invalidate(self, reason: str) -> None:
+        """Mark the cache stale so the next cycle lists the zone."""
+        if not self.stale:
+            logger.info("Record cache invalidated: %s", reason)
+        self.stale = True
+        self.records = {}
@@ -5,16 +5,35 @@ from __future__ import annotations
 import argparse
 import logging
 import os
+import re
 import sys
-from dataclasses import dataclass
-from typing import List, Optional, Sequence, Tuple
+import tempfile
+import time
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from dotenv import load_dotenv
 
-from .cloudflare import CloudflareAPI
-from .notifications import NotificationService
+from .cloudflare import DEFAULT_BATCH_SIZE, CloudflareAPI
+from .devices import ADDRESS_RECORD_TYPES
+from .filters import DeviceFilter, compile_filter
+from .governor import ChangeGovernor
+from .leader import CloudflareLeaseElector, FileLockElector, LeaderElector
+from .metrics import Metrics, MetricsServer
+from .notifications import NotificationQueue, NotificationService
+from .scheduler import CycleReport, IntervalScheduler
 from .sync import DNSSync
 from .tailscale import TailscaleAPI
+from .tracing import Tracer, span
+from .transport import (
+    CLOUDFLARE_RATE_BURST,
+    CLOUDFLARE_RATE_LIMIT,
+    HTTPTransport,
+    RateLimiter,
+)
+from .webhook import DeviceEvent, WebhookServer
 
 
 @dataclass
@@ -28,10 +47,92 @@ class AppConfig:
     cloudflare_domain: str
     cloudflare_base_domain: Optional[str]
     create_wildcard_records: bool
+    cloudflare_batch_size: int
+    record_types: List[str]
+    owner_id: Optional[str]
+    adopt_records: bool
     device_name_pattern: Optional[str]
     device_tags: Optional[List[str]]
+    device_filter: Optional[str]
     ntfy_topic: Optional[str]
     ntfy_server: str
+    ntfy_digest_interval: float
+    tailscale_webhook_secret: Optional[str]
+    state_file: Optional[str]
+    journal_file: Optional[str]
+    journal_max_attempts: int
+    record_cache_file: Optional[str]
+    full_reconcile_interval: float
+    full_reconcile_cycles: int
+    max_changes_per_run: int
+    max_changes_per_minute: int
+    max_delete_fraction: float
+    max_change_fraction: float
+    http_max_retries: int
+    http_backoff_base: float
+    cloudflare_rate_limit: float
+    cloudflare_rate_burst: int
+    leader_election: Optional[str]
+    leader_lock_file: str
+    leader_record: Optional[str]
+    leader_lease_seconds: float
+    leader_id: Optional[str]
+
+
+# Settings a targets file may set per tailnet/zone pair, with the type each
+# value is converted to; everything else in AppConfig (transport,
+# notifications) is shared by the whole process. ``list`` settings are
+# comma-separated strings or TOML arrays.
+TARGET_FIELD_TYPES: Dict[str, type] = {
+    "tailscale_api_key": str,
+    "tailscale_tailnet": str,
+    "cloudflare_api_token": str,
+    "cloudflare_zone_id": str,
+    "cloudflare_domain": str,
+    "cloudflare_base_domain": str,
+    "create_wildcard_records": bool,
+    "cloudflare_batch_size": int,
+    "record_types": list,
+    "owner_id": str,
+    "adopt_records": bool,
+    "device_name_pattern": str,
+    "device_tags": list,
+    "device_filter": str,
+    "tailscale_webhook_secret": str,
+    "state_file": str,
+    "journal_file": str,
+    "journal_max_attempts": int,
+    "record_cache_file": str,
+    "full_reconcile_interval": float,
+    "full_reconcile_cycles": int,
+    "max_changes_per_run": int,
+    "max_changes_per_minute": int,
+    "max_delete_fraction": float,
+    "max_change_fraction": float,
+}
+TARGET_FIELDS = frozenset(TARGET_FIELD_TYPES)
+
+# Files that hold one target's state and must not be shared between targets.
+TARGET_FILES = ("state_file", "journal_file", "record_cache_file")
+
+# ``${VAR}`` references left behind by ``os.path.expandvars`` when unset.
+_UNSET_REFERENCE = re.compile(r"\$\{([^}]*)\}")
+
+
+# Leader election backends; None runs without election.
+LEADER_BACKENDS = frozenset({None, "file", "cloudflare"})
+
+# Tailscale API alias for the caller's default tailnet.
+DEFAULT_TAILNET = "-"
+
+
+@dataclass
+class SyncTarget:
+    """One tailnet/zone pair synchronized by this process."""
+
+    name: Optional[str]
+    config: AppConfig
+    device_filter: DeviceFilter = field(default_factory=DeviceFilter)
 
 
 def configure_logging(verbose: bool) -> None:
@@ -53,7 +154,8 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
             "Examples:\n"
             "  %(prog)s                    # Normal sync\n"
             "  %(prog)s --dry-run          # Preview changes without applying them\n"
-            "  %(prog)s --verbose          # Enable debug logging\n\n"
+            "  %(prog)s --verbose          # Enable debug logging\n"
+            "  %(prog)s --daemon           # Sync every 5 minutes until stopped\n\n"
             "Configuration:\n"
             "  All configuration is done via environment variables in a .env file.\n"
             "  See .env.example for required variables."
@@ -75,9 +177,135 @@ def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
         action="store_true",
         help="Skip offline devices (default: include offline devices)",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        metavar="N",
+        help="Apply per-record DNS changes with up to N parallel requests",
+    )
+    parser.add_argument(
+        "--config",
+        metavar="FILE",
+        help="TOML file listing several tailnet/zone sync targets",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and sync on a fixed interval until stopped",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=300,
+        metavar="SECONDS",
+        help="Seconds between sync cycles in daemon mode (default: 300)",
+    )
+    parser.add_argument(
+        "--min-interval",
+        type=float,
+        metavar="SECONDS",
+        help="Shortest adaptive interval, used after cycles that changed "
+        "records or failed (default: --interval)",
+    )
+    parser.add_argument(
+        "--max-interval",
+        type=float,
+        metavar="SECONDS",
+        help="Longest adaptive interval, reached by doubling while cycles find "
+        "nothing to do (default: --interval)",
+    )
+    parser.add_argument(
+        "--interval-jitter",
+        type=float,
+        default=0.0,
+        metavar="FRACTION",
+        help="Randomly spread each wait by up to this fraction of the interval",
+    )
+    parser.add_argument(
+        "--webhook-listen",
+        metavar="HOST:PORT",
+        help="In daemon mode, also accept Tailscale webhooks on this address",
+    )
+    parser.add_argument(
+        "--metrics-listen",
+        metavar="HOST:PORT",
+        help="In daemon mode, serve Prometheus metrics on /metrics at this address",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="FILE",
+        help="Write Prometheus metrics to FILE after every run (textfile collector)",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        action="store_true",
+        help="Create missing records with one zone file import instead of "
+        "one request per record (for first syncs of large tailnets)",
+    )
+    parser.add_argument(
+        "--zone-file",
+        metavar="FILE",
+        help="With --bootstrap, also write the imported zone fragment to FILE",
+    )
+    parser.add_argument(
+        "--plan-out",
+        metavar="FILE",
+        help="Plan without applying and save the changes to FILE for review "
+        "(implies --dry-run)",
+    )
+    parser.add_argument(
+        "--apply-plan",
+        metavar="FILE",
+        help="Apply the changes saved in FILE, checking only the records they "
+        "touch instead of listing the zone",
+    )
+    parser.add_argument(
+        "--allow-empty-listing",
+        action="store_true",
+        help="Plan from an empty Cloudflare listing even though the last full "
+        "sync saw records (after removing them on purpose)",
+    )
+    parser.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="Append a JSON span tree of every run to FILE (one line per run)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Profile syncs with cProfile and write the stats to FILE",
+    )
     parser.add_argument("--version", action="version", version="%(prog)s 0.1.0")
 
-    return parser.parse_args(argv)
+    args = parser.parse_args(argv)
+    if args.interval <= 0:
+        parser.error("--interval must be greater than zero")
+    min_interval = args.interval if args.min_interval is None else args.min_interval
+    max_interval = args.interval if args.max_interval is None else args.max_interval
+    if min_interval <= 0:
+        parser.error("--min-interval must be greater than zero")
+    if min_interval > max_interval:
+        parser.error("--min-interval cannot exceed --max-interval")
+    if not 0 <= args.interval_jitter < 1:
+        parser.error("--interval-jitter must be at least 0 and below 1")
+    if args.webhook_listen and not args.daemon:
+        parser.error("--webhook-listen requires --daemon")
+    if args.metrics_listen and not args.daemon:
+        parser.error("--metrics-listen requires --daemon; use --metrics-file instead")
+    if args.bootstrap and args.daemon:
+        parser.error("--bootstrap is a one-off run and cannot be used with --daemon")
+    if args.zone_file and not args.bootstrap:
+        parser.error("--zone-file requires --bootstrap")
+    plan_options = (("--plan-out", args.plan_out), ("--apply-plan", args.apply_plan))
+    for option, value in plan_options:
+        if value and (args.daemon or args.bootstrap):
+            parser.error(f"{option} cannot be used with --daemon or --bootstrap")
+    if args.plan_out and args.apply_plan:
+        parser.error("--plan-out and --apply-plan cannot be used together")
+    # Saving a plan for review never writes records.
+    args.dry_run = args.dry_run or bool(args.plan_out)
+    return args
 
 
 def _parse_bool(value: Optional[str], default: bool = False) -> bool:
@@ -95,7 +323,50 @@ def _parse_list(value: Optional[str]) -> Optional[List[str]]:
     return [item for item in items if item]
 
 
-def load_config() -> AppConfig:
+def _parse_record_types(value: Optional[str]) -> List[str]:
+    """Parse a comma-separated list of managed DNS record types."""
+    record_types = [item.upper() for item in _parse_list(value) or ["A"]]
+    unknown = sorted(set(record_types) - set(ADDRESS_RECORD_TYPES))
+    if unknown:
+        raise ValueError(
+            f"Unsupported record types: {', '.join(unknown)} "
+            f"(expected {', '.join(ADDRESS_RECORD_TYPES)})"
+        )
+    return list(dict.fromkeys(record_types))
+
+
+def _parse_leader_election(value: Optional[str]) -> Optional[str]:
+    """Validate the leader election backend name."""
+    backend = (value or "").strip().lower() or None
+    if backend not in LEADER_BACKENDS:
+        raise ValueError(
+            f"Unsupported LEADER_ELECTION {value!r} "
+            f"(expected {', '.join(sorted(filter(None, LEADER_BACKENDS)))})"
+        )
+    return backend
+
+
+def _parse_int(value: Optional[str], default: int) -> int:
+    """Convert an integer environment value, falling back to a default."""
+    if value is None or not value.strip():
+        return default
+    try:
+        return int(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid integer value: {value!r}") from exc
+
+
+def _parse_float(value: Optional[str], default: float) -> float:
+    """Convert a numeric environment value, falling back to a default."""
+    if value is None or not value.strip():
+        return default
+    try:
+        return float(value)
+    except ValueError as exc:
+        raise ValueError(f"Invalid numeric value: {value!r}") from exc
+
+
+def load_config(validate: bool = True) -> AppConfig:
     """Load application configuration from environment variables."""
     config = AppConfig(
         tailscale_api_key=os.getenv("TAILSCALE_API_KEY", ""),
@@ -108,15 +379,92 @@ def load_config() -> AppConfig:
             os.getenv("CREATE_WILDCARD_RECORDS"),
             default=True,
         ),
+        cloudflare_batch_size=_parse_int(
+            os.getenv("CLOUDFLARE_BATCH_SIZE"),
+            default=DEFAULT_BATCH_SIZE,
+        ),
+        record_types=_parse_record_types(os.getenv("RECORD_TYPES")),
+        owner_id=os.getenv("OWNER_ID") or None,
+        adopt_records=_parse_bool(os.getenv("ADOPT_RECORDS")),
         device_name_pattern=os.getenv("DEVICE_NAME_PATTERN"),
         device_tags=_parse_list(
             os.getenv("DEVICE_TAG_FILTER") or os.getenv("DEVICE_TAGS")
         ),
+        device_filter=os.getenv("DEVICE_FILTER") or None,
         ntfy_topic=os.getenv("NTFY_TOPIC"),
         ntfy_server=os.getenv("NTFY_SERVER", "https://ntfy.sh"),
+        ntfy_digest_interval=_parse_float(
+            os.getenv("NTFY_DIGEST_INTERVAL"),
+            default=3600,
+        ),
+        tailscale_webhook_secret=os.getenv("TAILSCALE_WEBHOOK_SECRET") or None,
+        state_file=os.getenv("STATE_FILE") or None,
+        journal_file=os.getenv("JOURNAL_FILE") or None,
+        journal_max_attempts=_parse_int(
+            os.getenv("JOURNAL_MAX_ATTEMPTS"),
+            default=5,
+        ),
+        record_cache_file=os.getenv("RECORD_CACHE_FILE") or None,
+        full_reconcile_interval=_parse_float(
+            os.getenv("FULL_RECONCILE_INTERVAL"),
+            default=3600,
+        ),
+        full_reconcile_cycles=_parse_int(
+            os.getenv("FULL_RECONCILE_CYCLES"),
+            default=0,
+        ),
+        max_changes_per_run=_parse_int(os.getenv("MAX_CHANGES_PER_RUN"), default=0),
+        max_changes_per_minute=_parse_int(
+            os.getenv("MAX_CHANGES_PER_MINUTE"),
+            default=0,
+        ),
+        max_delete_fraction=_parse_float(
+            os.getenv("MAX_DELETE_FRACTION"),
+            default=0.0,
+        ),
+        max_change_fraction=_parse_float(
+            os.getenv("MAX_CHANGE_FRACTION"),
+            default=0.0,
+        ),
+        http_max_retries=_parse_int(os.getenv("HTTP_MAX_RETRIES"), default=3),
+        http_backoff_base=_parse_float(
+            os.getenv("HTTP_BACKOFF_BASE"),
+            default=0.5,
+        ),
+        cloudflare_rate_limit=_parse_float(
+            os.getenv("CLOUDFLARE_RATE_LIMIT"),
+            default=CLOUDFLARE_RATE_LIMIT,
+        ),
+        cloudflare_rate_burst=_parse_int(
+            os.getenv("CLOUDFLARE_RATE_BURST"),
+            default=CLOUDFLARE_RATE_BURST,
+        ),
+        leader_election=_parse_leader_election(os.getenv("LEADER_ELECTION")),
+        leader_lock_file=os.getenv("LEADER_LOCK_FILE")
+        or os.path.join(tempfile.gettempdir(), "tsync.leader.lock"),
+        leader_record=os.getenv("LEADER_RECORD") or None,
+        leader_lease_seconds=_parse_float(
+            os.getenv("LEADER_LEASE_SECONDS"),
+            default=60,
+        ),
+        leader_id=os.getenv("LEADER_ID") or None,
     )
 
-    required_fields = {
+    if validate:
+        missing = [
+            key for key, value in _required_fields(config).items() if not value
+        ]
+        if missing:
+            raise ValueError(
+                f"Missing required environment variables: {', '.join(missing)}"
+            )
+
+    return config
+
+
+def _required_fields(config: AppConfig) -> Dict[str, str]:
+    """Return the required settings keyed by their environment variable."""
+    return {
         "TAILSCALE_API_KEY": config.tailscale_api_key,
         "TAILSCALE_TAILNET": config.tailscale_tailnet,
         "CLOUDFLARE_API_TOKEN": config.cloudflare_api_token,
@@ -124,24 +472,149 @@ def load_config() -> AppConfig:
         "CLOUDFLARE_DOMAIN": config.cloudflare_domain,
     }
 
-    missing = [key for key, value in required_fields.items() if not value]
-    if missing:
-        raise ValueError(
-            f"Missing required environment variables: {', '.join(missing)}"
-        )
 
-    return config
+def load_targets(path: str, base: AppConfig) -> List[SyncTarget]:
+    """
+    Load sync targets from a TOML file.
 
+    Each ``[[targets]]`` table overrides per-target fields of ``base`` (the
+    environment configuration), after applying an optional ``[defaults]``
+    table. ``${VAR}`` references in string values are expanded from the
+    environment so secrets can stay out of the file.
+    """
+    with open(path, "rb") as handle:
+        data = tomllib.load(handle)
 
-def run_sync(
-    args: argparse.Namespace,
+    defaults = data.get("defaults", {})
+    tables = data.get("targets") or []
+    if not tables:
+        raise ValueError(f"No [[targets]] defined in {path}")
+
+    targets: List[SyncTarget] = []
+    for position, table in enumerate(tables, start=1):
+        name = str(table.get("name") or f"target-{position}")
+        overrides = {**defaults, **table}
+        overrides.pop("name", None)
+
+        unknown = sorted(set(overrides) - TARGET_FIELDS)
+        if unknown:
+            raise ValueError(
+                f"Unknown settings for target {name}: {', '.join(unknown)}"
+            )
+
+        for key, value in overrides.items():
+            if isinstance(value, str):
+                value = os.path.expandvars(value)
+                unset = _UNSET_REFERENCE.search(value)
+                if unset:
+                    raise ValueError(
+                        f"Environment variable {unset.group(1)} used in {key} "
+                        f"for target {name} is not set"
+                    )
+            try:
+                overrides[key] = _target_setting(key, value, getattr(base, key))
+            except ValueError as exc:
+                raise ValueError(f"Invalid {key} for target {name}: {exc}") from exc
+
+        # Files inherited from [defaults] or the environment get the target
+        # name appended, so targets never share state.
+        for key in TARGET_FILES:
+            base_path = overrides.get(key, getattr(base, key))
+            if base_path and key not in table and len(tables) > 1:
+                root, ext = os.path.splitext(base_path)
+                overrides[key] = f"{root}.{name}{ext}"
+
+        config = replace(base, **overrides)
+        required = _required_fields(config)
+        missing = [key.lower() for key, value in required.items() if not value]
+        if missing:
+            raise ValueError(
+                f"Missing required settings for target {name}: {', '.join(missing)}"
+            )
+        targets.append(SyncTarget(name, config))
+
+    names = [target.name for target in targets]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Target names must be unique in {path}")
+    for key in TARGET_FILES:
+        files = [getattr(target.config, key) for target in targets]
+        shared = {item for item in files if item and files.count(item) > 1}
+        if shared:
+            raise ValueError(
+                f"Targets in {path} must not share {key} {', '.join(sorted(shared))}"
+            )
+
+    return targets
+
+
+def _target_setting(key: str, value: Any, default: Any) -> Any:
+    """
+    Convert a targets file value to the type ``TARGET_FIELD_TYPES`` gives it.
+
+    Strings, such as expanded ``${VAR}`` references, are parsed like the
+    matching environment variable; TOML values of the right type are kept.
+    Raises ValueError for values that cannot be converted.
+    """
+    kind = TARGET_FIELD_TYPES[key]
+    if kind is list and isinstance(value, list):
+        value = ",".join(str(item) for item in value)
+    if isinstance(value, str):
+        if key == "record_types":
+            return _parse_record_types(value)
+        if kind is list:
+            return _parse_list(value)
+        if kind is bool:
+            return _parse_bool(value, default)
+        if kind is int:
+            return _parse_int(value, default)
+        if kind is float:
+            return _parse_float(value, default)
+        return value
+    if kind is bool and isinstance(value, bool):
+        return value
+    if kind in (int, float) and type(value) is int:
+        return kind(value)
+    if kind is float and isinstance(value, float):
+        return value
+    raise ValueError(f"expected {kind.__name__}, got {value!r}")
+
+
+def build_transport(
     config: AppConfig,
-    notification_service: NotificationService,
-) -> Tuple[int, int, int]:
-    """Execute the synchronization and send notifications."""
+    pool_size: int = 10,
+    metrics: Optional[Metrics] = None,
+    tracer: Optional[Tracer] = None,
+) -> HTTPTransport:
+    """Create the shared HTTP transport used by every API client."""
+    transport = HTTPTransport(
+        max_retries=config.http_max_retries,
+        backoff_base=config.http_backoff_base,
+        pool_size=pool_size,
+        metrics=metrics,
+        tracer=tracer,
+    )
+    transport.limit_host(
+        CloudflareAPI.base_url,
+        RateLimiter(config.cloudflare_rate_limit, config.cloudflare_rate_burst),
+    )
+    return transport
+
+
+def build_sync(
+    config: AppConfig,
+    transport: HTTPTransport,
+    concurrency: int = 1,
+    metrics: Optional[Metrics] = None,
+    tracer: Optional[Tracer] = None,
+    profile_path: Optional[str] = None,
+    record_cache: bool = False,
+    allow_empty_listing: bool = False,
+) -> DNSSync:
+    """Create the API clients and the synchronizer that drives them."""
     tailscale_api = TailscaleAPI(
         api_key=config.tailscale_api_key,
         tailnet=config.tailscale_tailnet,
+        transport=transport,
     )
     cloudflare_api = CloudflareAPI(
         api_token=config.cloudflare_api_token,
@@ -149,26 +622,263 @@ def run_sync(
         domain=config.cloudflare_domain,
         base_domain=config.cloudflare_base_domain,
         create_wildcard_records=config.create_wildcard_records,
+        batch_size=config.cloudflare_batch_size,
+        transport=transport,
+        record_types=config.record_types,
+        owner=config.owner_id,
+        adopt_unmarked=config.adopt_records,
     )
 
-    dns_sync = DNSSync(tailscale_api, cloudflare_api)
-    created, updated, deleted = dns_sync.sync(
-        name_pattern=config.device_name_pattern,
-        tags_filter=config.device_tags,
-        skip_offline=args.skip_offline,
-        dry_run=args.dry_run,
+    return DNSSync(
+        tailscale_api,
+        cloudflare_api,
+        concurrency=concurrency,
+        state_path=config.state_file,
+        full_sync_interval=config.full_reconcile_interval,
+        full_sync_cycles=config.full_reconcile_cycles,
+        metrics=metrics,
+        governor=ChangeGovernor(
+            max_per_run=config.max_changes_per_run,
+            max_per_minute=config.max_changes_per_minute,
+            max_delete_fraction=config.max_delete_fraction,
+            max_change_fraction=config.max_change_fraction,
+            allow_empty_listing=allow_empty_listing,
+        ),
+        tracer=tracer,
+        profile_path=profile_path,
+        journal_path=config.journal_file,
+        max_write_attempts=config.journal_max_attempts,
+        record_cache=record_cache,
+        cache_path=config.record_cache_file,
     )
 
+
+def build_elector(
+    config: AppConfig,
+    cloudflare: CloudflareAPI,
+) -> Optional[LeaderElector]:
+    """Create the configured leader elector, or None to always lead."""
+    if config.leader_election == "file":
+        return FileLockElector(
+            config.leader_lock_file,
+            holder_id=config.leader_id,
+            lease_seconds=config.leader_lease_seconds,
+        )
+    if config.leader_election == "cloudflare":
+        return CloudflareLeaseElector(
+            cloudflare,
+            record_name=config.leader_record,
+            holder_id=config.leader_id,
+            lease_seconds=config.leader_lease_seconds,
+        )
+    return None
+
+
+def target_path(path: Optional[str], target: SyncTarget) -> Optional[str]:
+    """Return ``path`` with the target name inserted before the extension."""
+    if path and target.name:
+        root, ext = os.path.splitext(path)
+        return f"{root}.{target.name}{ext}"
+    return path
+
+
+def run_sync(
+    args: argparse.Namespace,
+    target: SyncTarget,
+    notification_service: NotificationQueue,
+    dns_sync: DNSSync,
+) -> Tuple[int, int, int]:
+    """Execute the synchronization and send notifications."""
+    if args.apply_plan:
+        created, updated, deleted = dns_sync.apply_plan(
+            target_path(args.apply_plan, target),
+            dry_run=args.dry_run,
+        )
+    else:
+        created, updated, deleted = dns_sync.sync(
+            dry_run=args.dry_run,
+            device_filter=target.device_filter,
+            bootstrap=args.bootstrap,
+            zone_file=target_path(args.zone_file, target),
+            plan_out=target_path(args.plan_out, target),
+        )
+    abandoned = dns_sync.take_abandoned()
+    if abandoned:
+        notification_service.send_writes_abandoned(
+            [entry.describe() for entry in abandoned],
+            target=target.name,
+        )
+
     notification_service.send_sync_success(
         created,
         updated,
         deleted,
         args.dry_run,
+        target=target.name,
     )
 
     return created, updated, deleted
 
 
+def execute_sync(
+    args: argparse.Namespace,
+    target: SyncTarget,
+    notification_service: NotificationQueue,
+    dns_sync: DNSSync,
+) -> int:
+    """Run one synchronization, reporting failures, and return an exit code."""
+    logger = logging.getLogger(__name__)
+    prefix = f"[{target.name}] " if target.name else ""
+    metrics = dns_sync.metrics
+    label = target.name or "default"
+    started = time.monotonic()
+    try:
+        created, updated, deleted = run_sync(
+            args,
+            target,
+            notification_service,
+            dns_sync,
+        )
+        if metrics is not None:
+            metrics.cycle_duration.observe(time.monotonic() - started, target=label)
+            metrics.cycles.inc(target=label, result="success")
+            metrics.last_success.set(time.time(), target=label)
+        logger.info(
+            "%sSynchronization completed successfully: "
+            "%s created, %s updated, %s deleted",
+            prefix,
+            created,
+            updated,
+            deleted,
+        )
+        return 0
+    except Exception as exc:  # pylint: disable=broad-except
+        if metrics is not None:
+            metrics.cycle_duration.observe(time.monotonic() - started, target=label)
+            metrics.cycles.inc(target=label, result="failure")
+        logger.error("%sSynchronization failed: %s", prefix, exc)
+        notification_service.send_sync_failure(
+            str(exc),
+            args.dry_run,
+            target=target.name,
+        )
+        if args.verbose:
+            logger.debug("Exception details", exc_info=True)
+        return 1
+
+
+def execute_targets(
+    args: argparse.Namespace,
+    syncs: Sequence[Tuple[SyncTarget, DNSSync]],
+    notification_service: NotificationQueue,
+) -> int:
+    """
+    Synchronize every target, isolating failures, and return an exit code.
+
+    Targets share the ``--concurrency`` budget: up to that many run at once.
+    """
+    workers = min(len(syncs), args.concurrency)
+
+    def run(item: Tuple[SyncTarget, DNSSync]) -> int:
+        target, dns_sync = item
+        return execute_sync(args, target, notification_service, dns_sync)
+
+    if workers <= 1:
+        codes = [run(item) for item in syncs]
+    else:
+        with ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="tsync-target",
+        ) as executor:
+            codes = list(executor.map(run, syncs))
+
+    failed = sum(1 for code in codes if code)
+    if len(syncs) > 1:
+        logging.getLogger(__name__).info(
+            "Synchronized %s target(s), %s failed",
+            len(syncs),
+            failed,
+        )
+    return 1 if failed else 0
+
+
+def _parse_listen_address(value: str) -> Tuple[str, int]:
+    """Split a ``HOST:PORT`` listen address."""
+    host, _, port = value.rpartition(":")
+    try:
+        return host or "0.0.0.0", int(port)
+    except ValueError as exc:
+        raise ValueError(f"Invalid listen address: {value!r}") from exc
+
+
+def _event_matches(event: DeviceEvent, tailnet: str, targets: int) -> bool:
+    """Return whether a webhook event belongs to a target's tailnet.
+
+    ``-`` is the API's alias for the default tailnet; it matches any event
+    when it is the only target, since the event's real name cannot be compared.
+    """
+    if not event.tailnet or event.tailnet == tailnet:
+        return True
+    return tailnet == DEFAULT_TAILNET and targets == 1
+
+
+def start_webhook_server(
+    args: argparse.Namespace,
+    syncs: Sequence[Tuple[SyncTarget, DNSSync]],
+    elector: Optional[LeaderElector] = None,
+) -> WebhookServer:
+    """Start the webhook listener that reconciles single devices."""
+    secrets = sorted(
+        {
+            target.config.tailscale_webhook_secret
+            for target, _ in syncs
+            if target.config.tailscale_webhook_secret
+        }
+    )
+    if not secrets:
+        raise ValueError("TAILSCALE_WEBHOOK_SECRET is required for --webhook-listen")
+
+    def handle(event: DeviceEvent) -> None:
+        if elector is not None and not elector.is_leader:
+            logging.getLogger(__name__).debug(
+                "Standby replica ignoring webhook for %s",
+                event.device_name or event.device_id,
+            )
+            return
+        matched = [
+            (target, dns_sync)
+            for target, dns_sync in syncs
+            if _event_matches(event, target.config.tailscale_tailnet, len(syncs))
+        ]
+        if not matched:
+            logging.getLogger(__name__).warning(
+                "Webhook for %s from tailnet %r matches no configured target",
+                event.device_name or event.device_id,
+                event.tailnet,
+            )
+        for target, dns_sync in matched:
+            created, updated, deleted = dns_sync.sync_device(
+                event.device_id,
+                device_name=event.device_name,
+                deleted=event.deleted,
+                dry_run=args.dry_run,
+                device_filter=target.device_filter,
+            )
+            logging.getLogger(__name__).info(
+                "%sDevice sync for %s: %s created, %s updated, %s deleted",
+                f"[{target.name}] " if target.name else "",
+                event.device_name or event.device_id,
+                created,
+                updated,
+                deleted,
+            )
+
+    host, port = _parse_listen_address(args.webhook_listen)
+    server = WebhookServer(secrets, handle, host, port)
+    server.start()
+    return server
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     """CLI entrypoint."""
     args = parse_args(argv)
@@ -176,9 +886,23 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
 
     load_dotenv()
 
+    tracer = Tracer() if args.trace else None
     try:
-        config = load_config()
-    except ValueError as exc:
+        with span(tracer, "config", file=args.config):
+            if args.config:
+                config = load_config(validate=False)
+                targets = load_targets(args.config, config)
+            else:
+                config = load_config()
+                targets = [SyncTarget(None, config)]
+            for target in targets:
+                target.device_filter = compile_filter(
+                    target.config.device_filter,
+                    name_pattern=target.config.device_name_pattern,
+                    tags=target.config.device_tags,
+                    skip_offline=args.skip_offline,
+                )
+    except (OSError, ValueError) as exc:
         logger = logging.getLogger(__name__)
         logger.error(str(exc))
         logger.error(
@@ -187,25 +911,149 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
         )
         return 1
 
-    notification_service = NotificationService(
-        config.ntfy_topic,
-        config.ntfy_server,
+    metrics = Metrics() if args.metrics_listen or args.metrics_file else None
+    transport = build_transport(
+        config,
+        pool_size=max(10, args.concurrency),
+        metrics=metrics,
+        tracer=tracer,
     )
+    # Delivery runs in the background; only daemon mode merges bursts, since
+    # a one-shot run reports a single cycle per target.
+    notification_service = NotificationQueue(
+        NotificationService(
+            config.ntfy_topic,
+            config.ntfy_server,
+            transport=transport,
+        ),
+        digest_interval=config.ntfy_digest_interval if args.daemon else 0,
+        metrics=metrics,
+    )
+    per_target_concurrency = max(1, args.concurrency // len(targets))
+    syncs = [
+        (
+            target,
+            build_sync(
+                target.config,
+                transport,
+                per_target_concurrency,
+                metrics,
+                tracer=tracer,
+                profile_path=target_path(args.profile, target),
+                # Records stay cached between daemon cycles.
+                record_cache=args.daemon,
+                allow_empty_listing=args.allow_empty_listing,
+            ),
+        )
+        for target in targets
+    ]
 
     try:
-        created, updated, deleted = run_sync(args, config, notification_service)
-        logger = logging.getLogger(__name__)
-        logger.info(
-            "Synchronization completed successfully: %s created, %s updated, %s deleted",
-            created,
-            updated,
-            deleted,
+        # The lease lives in the first target's zone; every target shares it.
+        elector = build_elector(config, syncs[0][1].cloudflare)
+    except ValueError as exc:
+        logging.getLogger(__name__).error(str(exc))
+        return 1
+
+    def run_cycle() -> int:
+        if elector is not None and not elector.is_leader:
+            logging.getLogger(__name__).info(
+                "Standing by: %s holds the leader lease",
+                elector.leader or "another replica",
+            )
+            code = 0
+        else:
+            with span(tracer, "run", targets=len(syncs)) as current:
+                code = execute_targets(args, syncs, notification_service)
+                current.set(exit_code=code)
+        if tracer is not None:
+            try:
+                tracer.flush(args.trace)
+            except OSError as exc:
+                logging.getLogger(__name__).warning(
+                    "Cannot write trace file %s: %s",
+                    args.trace,
+                    exc,
+                )
+        if metrics is not None:
+            metrics.leader.set(elector is None or elector.is_leader)
+        if metrics is not None and args.metrics_file:
+            try:
+                metrics.write_textfile(args.metrics_file)
+            except OSError as exc:
+                logging.getLogger(__name__).warning(
+                    "Cannot write metrics file %s: %s",
+                    args.metrics_file,
+                    exc,
+                )
+        return code
+
+    try:
+        if elector is not None:
+            elector.start()
+        if not args.daemon:
+            return run_cycle()
+
+        webhook_server = None
+        metrics_server = None
+        try:
+            if args.webhook_listen:
+                webhook_server = start_webhook_server(args, syncs, elector)
+            if metrics is not None and args.metrics_listen:
+                metrics_server = MetricsServer(
+                    metrics,
+                    *_parse_listen_address(args.metrics_listen),
+                )
+                metrics_server.start()
+        except (OSError, ValueError) as exc:
+            logging.getLogger(__name__).error("Cannot start listener: %s", exc)
+            if webhook_server is not None:
+                webhook_server.stop()
+            return 1
+
+        scheduler = IntervalScheduler(
+            args.interval,
+            min_interval=args.min_interval,
+            max_interval=args.max_interval,
+            jitter=args.interval_jitter,
+            metrics=metrics,
         )
+        scheduler.install_signal_handlers()
+        if scheduler.adaptive:
+            logging.getLogger(__name__).info(
+                "Running as a daemon, syncing %s target(s) every %ss to %ss",
+                len(syncs),
+                scheduler.min_interval,
+                scheduler.max_interval,
+            )
+        else:
+            logging.getLogger(__name__).info(
+                "Running as a daemon, syncing %s target(s) every %ss",
+                len(syncs),
+                args.interval,
+            )
+
+        def scheduled_cycle() -> CycleReport:
+            writes = sum(dns_sync.write_count for _, dns_sync in syncs)
+            code = run_cycle()
+            quota = transport.take_quota()
+            return CycleReport(
+                ok=code == 0,
+                changes=sum(dns_sync.write_count for _, dns_sync in syncs) - writes,
+                quota=min(quota.values(), default=None),
+            )
+
+        try:
+            scheduler.run(scheduled_cycle)
+        finally:
+            if webhook_server is not None:
+                webhook_server.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
         return 0
-    except Exception as exc:  # pylint: disable=broad-except
-        logger = logging.getLogger(__name__)
-        logger.error("Synchronization failed: %s", exc)
-        notification_service.send_sync_failure(str(exc), args.dry_run)
-        if args.verbose:
-            logger.debug("Exception details", exc_info=True)
-        return 1
+    finally:
+        if elector is not None:
+            elector.stop()
+        notification_service.close()
+        transport.log_stats()
+        transport.close()
@@ -3,12 +3,52 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 import requests
 
+from .tracing import span
+from .transport import HTTPTransport, not_sent
+
 logger = logging.getLogger(__name__)
 
+# Cloudflare accepts up to 200 record changes per batch request on the
+# free plan; paid plans allow more, so the size is configurable.
+DEFAULT_BATCH_SIZE = 200
+
+# Largest page size accepted by the DNS record listing endpoint.
+MAX_PAGE_SIZE = 5000
+
+# Cloudflare error codes for a record that already exists.
+RECORD_EXISTS_CODES = frozenset({81053, 81057, 81058})
+
+# Cloudflare error code for a record ID that does not exist.
+RECORD_NOT_FOUND_CODES = frozenset({81044})
+
+# Records created by a deployment carry this prefix plus its owner ID in
+# their comment, which the listing endpoint can filter on.
+OWNER_COMMENT_PREFIX = "tsync:"
+
+
+@dataclass(frozen=True)
+class RecordChange:
+    """A single DNS record mutation to apply against Cloudflare."""
+
+    action: str
+    name: str
+    content: str = ""
+    record_id: Optional[str] = None
+    record_type: str = "A"
+    previous_content: Optional[str] = None
+
+
+ChangeResult = Tuple[RecordChange, bool]
+
+
+class IncompleteListingError(RuntimeError):
+    """Raised when a record listing ends before the whole zone was returned."""
+
 
 class CloudflareAPI:
     """Client wrapper for Cloudflare DNS record management."""
@@ -22,55 +62,216 @@ class CloudflareAPI:
         domain: str,
         base_domain: Optional[str] = None,
         create_wildcard_records: bool = False,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        transport: Optional[HTTPTransport] = None,
+        record_types: Sequence[str] = ("A",),
+        owner: Optional[str] = None,
+        adopt_unmarked: bool = False,
     ) -> None:
         self.api_token = api_token
         self.zone_id = zone_id
         self.domain = domain
         self.base_domain = base_domain or domain
         self.create_wildcard_records = create_wildcard_records
+        self.record_types = tuple(record_types)
+        self.owner_comment = f"{OWNER_COMMENT_PREFIX}{owner}" if owner else None
+        self.adopt_unmarked = adopt_unmarked and bool(owner)
+        self.batch_size = batch_size
+        self.batch_supported = batch_size > 0
+        self.transport = transport or HTTPTransport()
+        # Last error message of a failed write, by (name, type).
+        self.last_errors: Dict[Tuple[str, str], str] = {}
+        # Names whose write failed because the record was missing or already
+        # existed, i.e. the caller's view of the zone is out of date.
+        self.conflicts: Set[str] = set()
+        # IDs of records created so far, by (name, type).
+        self.created_ids: Dict[Tuple[str, str], str] = {}
         self.headers = {
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json",
         }
 
-    def get_dns_records(self, record_type: str = "A") -> List[Dict]:
+    def get_dns_records(
+        self,
+        record_type: str = "A",
+        name_suffix: Optional[str] = None,
+    ) -> List[Dict]:
         """Return all DNS records of the requested type."""
+        try:
+            return list(self.iter_dns_records(record_type, name_suffix))
+        except (requests.exceptions.RequestException, IncompleteListingError) as exc:
+            logger.error("Failed to retrieve Cloudflare DNS records: %s", exc)
+            return []
+
+    def iter_dns_records(
+        self,
+        record_type: Optional[str] = "A",
+        name_suffix: Optional[str] = None,
+    ) -> Iterator[Dict]:
+        """
+        Yield DNS records of the requested type (or all types for None).
+
+        Every page is requested at the largest size the API allows and only
+        the current page is held in memory. When ``name_suffix`` is given the
+        zone is filtered server-side to names ending with it, and with an
+        owner set only records carrying its marker are returned. Request failures
+        are raised so a partial listing is never mistaken for the full zone,
+        and ``IncompleteListingError`` is raised when fewer records arrive
+        than the API reported.
+        """
         url = f"{self.base_url}/zones/{self.zone_id}/dns_records"
-        params = {"type": record_type}
+        params: Dict[str, object] = {"per_page": MAX_PAGE_SIZE}
+        if record_type:
+            params["type"] = record_type
+        if name_suffix:
+            params["name.endswith"] = name_suffix
+        self._filter_owned(params)
 
-        try:
-            response = requests.get(
+        page = 1
+        received = 0
+        expected: Optional[int] = None
+        while True:
+            params["page"] = page
+            response = self.transport.get(
                 url,
+                api="cloudflare",
+                endpoint="dns_records.list",
                 headers=self.headers,
                 params=params,
                 timeout=15,
             )
             response.raise_for_status()
-        except requests.exceptions.RequestException as exc:
-            logger.error("Failed to retrieve Cloudflare DNS records: %s", exc)
-            return []
 
-        data = response.json()
-        return data.get("result", [])
+            data = response.json()
+            if data.get("success") is False:
+                raise IncompleteListingError(
+                    f"Cloudflare rejected the listing: {data.get('errors')}"
+                )
+            records = data.get("result") or []
+            received += len(records)
+            yield from records
 
-    def create_dns_record(
+            info = data.get("result_info") or {}
+            if expected is None:
+                expected = info.get("total_count")
+            total_pages = info.get("total_pages") or 1
+            if page >= total_pages or not records:
+                break
+            page += 1
+
+        if page < total_pages or (expected is not None and received < expected):
+            raise IncompleteListingError(
+                f"Listing ended after {received} of {expected} records "
+                f"(page {page} of {total_pages})"
+            )
+
+    def find_dns_records(
         self,
         name: str,
-        content: str,
-        record_type: str = "A",
-    ) -> bool:
-        """Create a new DNS record."""
+        record_type: Optional[str] = "A",
+    ) -> List[Dict]:
+        """
+        Return the records with exactly ``name``, of every type for None.
+
+        Request failures are raised so a failed lookup is never mistaken for
+        a missing record.
+        """
         url = f"{self.base_url}/zones/{self.zone_id}/dns_records"
-        payload = {
+        params = {"name.exact": name}
+        if record_type:
+            params["type"] = record_type
+        self._filter_owned(params)
+
+        response = self.transport.get(
+            url,
+            api="cloudflare",
+            endpoint="dns_records.find",
+            headers=self.headers,
+            params=params,
+            timeout=15,
+        )
+        response.raise_for_status()
+
+        return response.json().get("result") or []
+
+    def import_zone(self, zone: str) -> Dict:
+        """
+        Upload BIND zone text through the DNS import endpoint.
+
+        Returns the API result, which counts the records parsed and added.
+        Request failures and rejected imports are raised.
+        """
+        url = f"{self.base_url}/zones/{self.zone_id}/dns_records/import"
+        body = zone.encode("utf-8")
+        tracer = self.transport.tracer
+        with span(tracer, "cloudflare.import", bytes=len(body)) as current:
+            response = self.transport.post(
+                url,
+                api="cloudflare",
+                endpoint="dns_records.import",
+                # Let requests set the multipart content type.
+                headers={"Authorization": self.headers["Authorization"]},
+                files={"file": ("tsync.zone", body, "text/plain")},
+                timeout=120,
+            )
+            response.raise_for_status()
+
+            data = response.json()
+            if data.get("success") is False:
+                raise ValueError(
+                    f"Cloudflare rejected the import: {data.get('errors')}"
+                )
+            result = data.get("result") or {}
+            current.set(added=result.get("recs_added"))
+            return result
+
+    def owns(self, record: Dict) -> Optional[bool]:
+        """
+        Return whether this deployment owns ``record``.
+
+        Records are all owned when no owner is configured. Unmarked records
+        return None: they belong to nobody yet and are only claimed when
+        adoption is enabled.
+        """
+        if self.owner_comment is None:
+            return True
+        comment = record.get("comment") or ""
+        if comment == self.owner_comment:
+            return True
+        return None if not comment else False
+
+    def _filter_owned(self, params: Dict[str, object]) -> None:
+        """Restrict a listing to records carrying this deployment's marker."""
+        if self.owner_comment and not self.adopt_unmarked:
+            params["comment.exact"] = self.owner_comment
+
+    def _record_payload(self, name: str, content: str, record_type: str) -> Dict:
+        """Return the body for creating or replacing a record."""
+        payload: Dict[str, object] = {
             "type": record_type,
             "name": name,
             "content": content,
             "ttl": 300,
         }
+        if self.owner_comment:
+            payload["comment"] = self.owner_comment
+        return payload
+
+    def create_dns_record(
+        self,
+        name: str,
+        content: str,
+        record_type: str = "A",
+    ) -> bool:
+        """Create a new DNS record."""
+        url = f"{self.base_url}/zones/{self.zone_id}/dns_records"
+        payload = self._record_payload(name, content, record_type)
 
         try:
-            response = requests.post(
+            response = self.transport.post(
                 url,
+                api="cloudflare",
+                endpoint="dns_records.create",
                 headers=self.headers,
                 json=payload,
                 timeout=15,
@@ -78,9 +279,11 @@ class CloudflareAPI:
             response.raise_for_status()
         except requests.exceptions.RequestException as exc:
             logger.error("Failed to create DNS record %s: %s", name, exc)
+            self._write_failed(name, record_type, exc)
             return False
 
         logger.info("Created DNS record %s -> %s", name, content)
+        self._remember_created([_json_result(response)])
         return True
 
     def update_dns_record(
@@ -92,16 +295,13 @@ class CloudflareAPI:
     ) -> bool:
         """Update an existing DNS record."""
         url = f"{self.base_url}/zones/{self.zone_id}/dns_records/{record_id}"
-        payload = {
-            "type": record_type,
-            "name": name,
-            "content": content,
-            "ttl": 300,
-        }
+        payload = self._record_payload(name, content, record_type)
 
         try:
-            response = requests.put(
+            response = self.transport.put(
                 url,
+                api="cloudflare",
+                endpoint="dns_records.update",
                 headers=self.headers,
                 json=payload,
                 timeout=15,
@@ -109,25 +309,267 @@ class CloudflareAPI:
             response.raise_for_status()
         except requests.exceptions.RequestException as exc:
             logger.error("Failed to update DNS record %s: %s", name, exc)
+            self._write_failed(name, record_type, exc)
             return False
 
         logger.info("Updated DNS record %s -> %s", name, content)
         return True
 
-    def delete_dns_record(self, record_id: str, name: str) -> bool:
-        """Delete a DNS record."""
+    def delete_dns_record(
+        self,
+        record_id: str,
+        name: str,
+        record_type: str = "A",
+    ) -> bool:
+        """Delete a DNS record; ``record_type`` only labels failures."""
         url = f"{self.base_url}/zones/{self.zone_id}/dns_records/{record_id}"
 
         try:
-            response = requests.delete(
+            response = self.transport.delete(
                 url,
+                api="cloudflare",
+                endpoint="dns_records.delete",
                 headers=self.headers,
                 timeout=15,
             )
             response.raise_for_status()
         except requests.exceptions.RequestException as exc:
             logger.error("Failed to delete DNS record %s: %s", name, exc)
+            self._write_failed(name, record_type, exc)
             return False
 
         logger.info("Deleted DNS record %s", name)
         return True
+
+    def apply_change(self, change: RecordChange) -> bool:
+        """Apply a single record change using the per-record endpoints."""
+        if change.action == "create":
+            return self.create_dns_record(
+                change.name,
+                change.content,
+                change.record_type,
+            )
+        if change.action == "update" and change.record_id:
+            return self.update_dns_record(
+                change.record_id,
+                change.name,
+                change.content,
+                change.record_type,
+            )
+        if change.action == "delete" and change.record_id:
+            return self.delete_dns_record(
+                change.record_id,
+                change.name,
+                change.record_type,
+            )
+
+        logger.error("Unsupported DNS change %s for %s", change.action, change.name)
+        key = (change.name, change.record_type)
+        self.last_errors[key] = f"unsupported change {change.action}"
+        return False
+
+    def apply_changes(
+        self,
+        changes: Sequence[RecordChange],
+        fallback: Optional[
+            Callable[[Sequence[RecordChange]], List[ChangeResult]]
+        ] = None,
+    ) -> List[ChangeResult]:
+        """
+        Apply record changes, batching them when the API allows it.
+
+        Changes are sent through the batch endpoint in chunks of
+        ``batch_size``. A batch is applied atomically by Cloudflare, so a
+        rejected chunk is retried record by record to find out exactly which
+        changes succeed. ``fallback`` replaces the sequential per-record path.
+
+        A chunk that timed out or got a 5xx may have been applied, so it is
+        not re-sent: it and every later chunk are reported as failed and
+        their names as conflicts, leaving the next lookup to reconcile them.
+        """
+        apply_individually = fallback or self._apply_individually
+        with span(
+            self.transport.tracer,
+            "cloudflare.apply",
+            changes=len(changes),
+            batched=self.batch_supported,
+        ):
+            if not self.batch_supported:
+                return apply_individually(changes)
+
+            results: List[ChangeResult] = []
+            for start in range(0, len(changes), self.batch_size):
+                chunk = changes[start : start + self.batch_size]
+                applied = self._submit_batch(chunk) if self.batch_supported else False
+                if applied is None:
+                    unsent = changes[start + len(chunk) :]
+                    self._outcome_unknown(chunk, unsent)
+                    results.extend((change, False) for change in changes[start:])
+                    break
+                if applied:
+                    results.extend((change, True) for change in chunk)
+                else:
+                    results.extend(apply_individually(chunk))
+
+            return results
+
+    def _apply_individually(
+        self,
+        changes: Sequence[RecordChange],
+    ) -> List[ChangeResult]:
+        """Apply changes one request at a time."""
+        return [(change, self.apply_change(change)) for change in changes]
+
+    def _submit_batch(self, changes: Sequence[RecordChange]) -> Optional[bool]:
+        """
+        Send one chunk of changes through the batch endpoint.
+
+        Returns True when applied, False when Cloudflare did not apply it and
+        None when it may have been applied (timeouts and 5xx responses).
+        """
+        url = f"{self.base_url}/zones/{self.zone_id}/dns_records/batch"
+        payload: Dict[str, List[Dict]] = {"deletes": [], "patches": [], "posts": []}
+
+        for change in changes:
+            if change.action == "delete":
+                payload["deletes"].append({"id": change.record_id})
+            elif change.action == "update":
+                payload["patches"].append(
+                    {
+                        "id": change.record_id,
+                        **self._record_payload(
+                            change.name,
+                            change.content,
+                            change.record_type,
+                        ),
+                    }
+                )
+            else:
+                payload["posts"].append(
+                    self._record_payload(
+                        change.name,
+                        change.content,
+                        change.record_type,
+                    )
+                )
+
+        try:
+            response = self.transport.post(
+                url,
+                api="cloudflare",
+                endpoint="dns_records.batch",
+                headers=self.headers,
+                json=payload,
+                timeout=30,
+            )
+        except requests.exceptions.RequestException as exc:
+            if not not_sent(exc):
+                logger.error("Batch DNS request failed after sending: %s", exc)
+                return None
+            logger.warning("Batch DNS request failed, applying individually: %s", exc)
+            return False
+
+        missing_record = response.status_code == 404 and bool(
+            _error_codes(response) & RECORD_NOT_FOUND_CODES
+        )
+        if response.status_code in (404, 405, 501) and not missing_record:
+            logger.warning(
+                "Batch DNS endpoint unavailable (HTTP %s); "
+                "falling back to per-record requests",
+                response.status_code,
+            )
+            self.batch_supported = False
+            return False
+
+        if response.status_code >= 500:
+            logger.error(
+                "Batch of %s DNS changes failed with HTTP %s; it may have been applied",
+                len(changes),
+                response.status_code,
+            )
+            return None
+
+        if not response.ok:
+            logger.warning(
+                "Batch of %s DNS changes rejected (HTTP %s), applying individually",
+                len(changes),
+                response.status_code,
+            )
+            return False
+
+        for change in changes:
+            if change.action == "delete":
+                logger.info("Deleted DNS record %s", change.name)
+            elif change.action == "update":
+                logger.info("Updated DNS record %s -> %s", change.name, change.content)
+            else:
+                logger.info("Created DNS record %s -> %s", change.name, change.content)
+        self._remember_created(_json_result(response).get("posts") or [])
+
+        return True
+
+    def _outcome_unknown(
+        self,
+        chunk: Sequence[RecordChange],
+        unsent: Sequence[RecordChange],
+    ) -> None:
+        """Record failures for a batch that may have landed and those after it."""
+        if unsent:
+            logger.warning(
+                "Not sending %s further DNS changes after an uncertain batch",
+                len(unsent),
+            )
+        for change in chunk:
+            key = (change.name, change.record_type)
+            self.last_errors[key] = "batch outcome unknown; reconciled on the next run"
+            self.conflicts.add(change.name)
+        for change in unsent:
+            key = (change.name, change.record_type)
+            self.last_errors[key] = "not sent after a batch with an unknown outcome"
+
+    def _write_failed(
+        self,
+        name: str,
+        record_type: str,
+        exc: requests.exceptions.RequestException,
+    ) -> None:
+        """Remember why a write of ``name`` and ``record_type`` failed."""
+        self.last_errors[(name, record_type)] = str(exc)
+        response = getattr(exc, "response", None)
+        if response is not None and _is_conflict(response):
+            self.conflicts.add(name)
+
+    def _remember_created(self, records: Sequence[Dict]) -> None:
+        """Record the IDs Cloudflare assigned to newly created records."""
+        for record in records:
+            if record.get("id") and record.get("name") and record.get("type"):
+                self.created_ids[(record["name"], record["type"])] = record["id"]
+
+
+def _json_result(response: requests.Response) -> Dict:
+    """Return the ``result`` object of an API response, or {} if absent."""
+    try:
+        result = response.json().get("result")
+    except (ValueError, AttributeError):
+        return {}
+    return result if isinstance(result, dict) else {}
+
+
+def _is_conflict(response: requests.Response) -> bool:
+    """Return True when a write failed because the record was gone or existed."""
+    if response.status_code in (404, 409):
+        return True
+    return bool(_error_codes(response) & RECORD_EXISTS_CODES)
+
+
+def _error_codes(response: requests.Response) -> Set[int]:
+    """Return the Cloudflare error codes in an API response body."""
+    try:
+        errors = response.json().get("errors") or []
+    except (ValueError, AttributeError):
+        return set()
+    return {
+        error["code"]
+        for error in errors
+        if isinstance(error, dict) and isinstance(error.get("code"), int)
+    }
@@ -0,0 +1,147 @@
+"""Compact Tailscale device records and incremental parsing of device lists."""
+
+from __future__ import annotations
+
+import codecs
+import json
+import re
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+# Tags repeat across most devices, so the parsed set for each distinct raw
+# tag list is built once and shared.
+TagCache = Dict[Tuple[str, ...], FrozenSet[str]]
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+# DNS record type published for each Device address attribute.
+ADDRESS_RECORD_TYPES: Dict[str, str] = {"A": "ipv4", "AAAA": "ipv6"}
+
+
+@dataclass(slots=True)
+class Device:
+    """The fields of a Tailscale device that tsync uses."""
+
+    id: str
+    hostname: str
+    ipv4: Optional[str]
+    ipv6: Optional[str]
+    tags: FrozenSet[str]
+    online: bool
+    os: str = ""
+    authorized: bool = True
+    last_seen: Optional[float] = None
+    expires: Optional[float] = None
+
+    @classmethod
+    def from_api(cls, data: Dict, tag_cache: Optional[TagCache] = None) -> "Device":
+        """Build a device from an API payload, keeping only the used fields."""
+        name = data.get("name") or ""
+        if "." in name:
+            hostname = hostname_for(name)
+        else:
+            hostname = (data.get("hostname") or "").lower()
+
+        ipv4 = ipv6 = None
+        for address in data.get("addresses") or ():
+            if ":" in address:
+                ipv6 = ipv6 or address
+            elif address.startswith("100."):
+                ipv4 = ipv4 or address
+
+        raw_tags = tuple(data.get("tags") or ())
+        tags = tag_cache.get(raw_tags) if tag_cache is not None else None
+        if tags is None:
+            tags = frozenset(sys.intern(tag.lower()) for tag in raw_tags)
+            if tag_cache is not None:
+                tag_cache[raw_tags] = tags
+
+        return cls(
+            id=str(data.get("id") or data.get("nodeId") or ""),
+            hostname=sys.intern(hostname),
+            ipv4=ipv4,
+            ipv6=ipv6,
+            tags=tags,
+            online=bool(data.get("online", False)),
+            os=sys.intern((data.get("os") or "").lower()),
+            authorized=bool(data.get("authorized", True)),
+            last_seen=parse_timestamp(data.get("lastSeen")),
+            expires=(
+                None
+                if data.get("keyExpiryDisabled")
+                else parse_timestamp(data.get("expires"))
+            ),
+        )
+
+    def address(self, record_type: str) -> Optional[str]:
+        """Return the address published in ``record_type`` records, if any."""
+        return getattr(self, ADDRESS_RECORD_TYPES[record_type])
+
+    def expired(self, now: float) -> bool:
+        """Return True when the device key has expired at ``now``."""
+        return self.expires is not None and self.expires <= now
+
+
+def hostname_for(device_name: str) -> str:
+    """Return the DNS label tsync uses for a MagicDNS device name."""
+    return device_name.split(".")[0].lower()
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Convert an RFC 3339 API timestamp to Unix time, or None if unset."""
+    if not value or value.startswith("0001-"):
+        return None
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return None
+
+
+def iter_json_array(chunks: Iterable[bytes], key: str) -> Iterator[Dict]:
+    """
+    Yield the items of the array stored under ``key`` while bytes arrive.
+
+    Only the unparsed tail of the stream is buffered, so memory stays around
+    one chunk plus one item instead of the whole document. The array must be
+    the first occurrence of ``"<key>": [`` in the document, which holds for
+    the Tailscale device list. Raises ``ValueError`` if the stream ends
+    before the array is closed.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+    buffer = ""
+    in_array = False
+
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        if not in_array:
+            match = start.search(buffer)
+            if match is None:
+                continue
+            buffer = buffer[match.end() :]
+            in_array = True
+
+        position = 0
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if buffer.startswith("]", position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The item continues in the next chunk.
+                break
+            yield item
+        buffer = buffer[position:]
+
+    raise ValueError(f"Response ended before the {key!r} array was complete")
+
+
+def iter_devices(chunks: Iterable[bytes]) -> Iterator[Device]:
+    """Parse a ``/devices`` response body into compact device records."""
+    tag_cache: TagCache = {}
+    for data in iter_json_array(chunks, "devices"):
+        yield Device.from_api(data, tag_cache)
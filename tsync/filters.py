@@ -0,0 +1,249 @@
+"""Device filter expressions compiled into predicates."""
+
+from __future__ import annotations
+
+import re
+import shlex
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, FrozenSet, List, Optional, Pattern, Sequence, Tuple
+
+from .devices import Device
+
+DevicePredicate = Callable[[Device], bool]
+
+DURATION_UNITS: Dict[str, float] = {
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+}
+
+# Terms that test a boolean device attribute, e.g. ``online`` or ``-expired``.
+FLAG_TERMS = frozenset({"online", "authorized", "expired"})
+
+_DURATION = re.compile(r"^([<>])\s*(\d+(?:\.\d+)?)\s*([smhdw]?)$")
+
+
+@dataclass(frozen=True)
+class DeviceFilter:
+    """
+    A parsed device filter.
+
+    Criteria of different kinds must all match. Repeated include terms of the
+    same kind match if any of them does, and a device matching any exclude
+    term is dropped. Call ``predicate`` once per sync to get a function that
+    tests only the configured criteria.
+    """
+
+    source: str = ""
+    include_tags: FrozenSet[str] = frozenset()
+    exclude_tags: FrozenSet[str] = frozenset()
+    include_names: Optional[Pattern[str]] = None
+    exclude_names: Optional[Pattern[str]] = None
+    include_os: FrozenSet[str] = frozenset()
+    exclude_os: FrozenSet[str] = frozenset()
+    online: Optional[bool] = None
+    authorized: Optional[bool] = None
+    expired: Optional[bool] = None
+    seen_within: Optional[float] = None
+    unseen_for: Optional[float] = None
+
+    def predicate(self, now: Optional[float] = None) -> DevicePredicate:
+        """Return a predicate evaluating this filter at time ``now``."""
+        now = time.time() if now is None else now
+        checks: List[DevicePredicate] = []
+
+        # Cheap attribute tests first so most rejections exit early.
+        if self.online is not None:
+            online = self.online
+            checks.append(lambda device: device.online is online)
+        if self.authorized is not None:
+            authorized = self.authorized
+            checks.append(lambda device: device.authorized is authorized)
+        if self.include_tags:
+            include_tags = self.include_tags
+            checks.append(lambda device: not include_tags.isdisjoint(device.tags))
+        if self.exclude_tags:
+            exclude_tags = self.exclude_tags
+            checks.append(lambda device: exclude_tags.isdisjoint(device.tags))
+        if self.include_os:
+            include_os = self.include_os
+            checks.append(lambda device: device.os in include_os)
+        if self.exclude_os:
+            exclude_os = self.exclude_os
+            checks.append(lambda device: device.os not in exclude_os)
+        if self.expired is not None:
+            expired = self.expired
+            checks.append(lambda device: device.expired(now) is expired)
+        if self.seen_within is not None:
+            seen_after = now - self.seen_within
+            checks.append(
+                lambda device: device.last_seen is not None
+                and device.last_seen >= seen_after
+            )
+        if self.unseen_for is not None:
+            seen_before = now - self.unseen_for
+            checks.append(
+                lambda device: device.last_seen is None
+                or device.last_seen < seen_before
+            )
+        if self.include_names is not None:
+            include_match = self.include_names.match
+            checks.append(lambda device: include_match(device.hostname) is not None)
+        if self.exclude_names is not None:
+            exclude_match = self.exclude_names.match
+            checks.append(lambda device: exclude_match(device.hostname) is None)
+
+        if not checks:
+            return lambda device: True
+        if len(checks) == 1:
+            return checks[0]
+
+        def matches(device: Device) -> bool:
+            for check in checks:
+                if not check(device):
+                    return False
+            return True
+
+        return matches
+
+
+def compile_filter(
+    expression: Optional[str] = None,
+    name_pattern: Optional[str] = None,
+    tags: Optional[Sequence[str]] = None,
+    skip_offline: bool = False,
+) -> DeviceFilter:
+    """
+    Parse a filter expression, merged with the legacy filter settings.
+
+    ``expression`` is a whitespace-separated list of terms; prefix a term
+    with ``-`` or ``!`` to negate it::
+
+        tag:server -tag:ephemeral name:^web name:^db os:linux,windows
+        online -expired authorized seen:<24h
+
+    ``name_pattern``, ``tags`` and ``skip_offline`` are added as if written
+    as ``name:``, ``tag:`` and ``online`` terms. Raises ``ValueError`` for
+    unknown terms or invalid values.
+    """
+    include_tags: List[str] = [_tag(tag) for tag in tags or ()]
+    exclude_tags: List[str] = []
+    include_names: List[str] = [name_pattern] if name_pattern else []
+    exclude_names: List[str] = []
+    include_os: List[str] = []
+    exclude_os: List[str] = []
+    flags: Dict[str, bool] = {"online": True} if skip_offline else {}
+    ages: Dict[bool, float] = {}
+
+    for term in _split_terms(expression or ""):
+        negate = term[:1] in ("-", "!")
+        key, _, value = (term[1:] if negate else term).partition(":")
+        key = key.lower()
+
+        if key == "tag":
+            target = exclude_tags if negate else include_tags
+            target.extend(_tag(tag) for tag in _values(value, term))
+        elif key == "name":
+            if not value:
+                raise ValueError(f"Device filter term {term!r} needs a regex")
+            (exclude_names if negate else include_names).append(value)
+        elif key == "os":
+            target = exclude_os if negate else include_os
+            target.extend(item.lower() for item in _values(value, term))
+        elif key in FLAG_TERMS:
+            flags[key] = _flag(value, term) != negate
+        elif key == "seen":
+            within, seconds = _age(value, term)
+            ages[within != negate] = seconds
+        else:
+            raise ValueError(f"Unknown device filter term: {term!r}")
+
+    source = " ".join(
+        part
+        for part in (
+            f"name:{shlex.quote(name_pattern)}" if name_pattern else "",
+            f"tag:{','.join(tags)}" if tags else "",
+            "online" if skip_offline else "",
+            (expression or "").strip(),
+        )
+        if part
+    )
+
+    return DeviceFilter(
+        source=source,
+        include_tags=frozenset(include_tags),
+        exclude_tags=frozenset(exclude_tags),
+        include_names=_combine(include_names),
+        exclude_names=_combine(exclude_names),
+        include_os=frozenset(include_os),
+        exclude_os=frozenset(exclude_os),
+        online=flags.get("online"),
+        authorized=flags.get("authorized"),
+        expired=flags.get("expired"),
+        seen_within=ages.get(True),
+        unseen_for=ages.get(False),
+    )
+
+
+def _tag(value: str) -> str:
+    """Normalise a tag to the lower-case ``tag:name`` form the API returns."""
+    value = value.strip().lower()
+    return value if value.startswith("tag:") else f"tag:{value}"
+
+
+def _split_terms(expression: str) -> List[str]:
+    """
+    Split ``expression`` on whitespace, honouring quotes.
+
+    Unlike ``shlex.split`` backslashes are kept, so regexes such as
+    ``name:^web\\d+$`` reach the compiler intact.
+    """
+    lexer = shlex.shlex(expression, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    lexer.escape = ""
+    return list(lexer)
+
+
+def _values(value: str, term: str) -> List[str]:
+    """Split a comma-separated term value."""
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    if not items:
+        raise ValueError(f"Device filter term {term!r} needs a value")
+    return items
+
+
+def _flag(value: str, term: str) -> bool:
+    """Parse the optional ``:true``/``:false`` suffix of a flag term."""
+    if not value:
+        return True
+    lowered = value.lower()
+    if lowered in {"true", "yes", "1"}:
+        return True
+    if lowered in {"false", "no", "0"}:
+        return False
+    raise ValueError(f"Invalid boolean in device filter term {term!r}")
+
+
+def _age(value: str, term: str) -> Tuple[bool, float]:
+    """Parse ``<24h`` or ``>7d`` into (seen within?, seconds)."""
+    match = _DURATION.match(value.strip())
+    if match is None:
+        raise ValueError(
+            f"Device filter term {term!r} needs a duration such as seen:<24h"
+        )
+    comparison, amount, unit = match.groups()
+    return comparison == "<", float(amount) * DURATION_UNITS[unit or "s"]
+
+
+def _combine(patterns: List[str]) -> Optional[Pattern[str]]:
+    """Join several regexes into one alternation matched at the start."""
+    if not patterns:
+        return None
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in patterns))
+    except re.error as exc:
+        raise ValueError(f"Invalid device name pattern: {exc}") from exc
@@ -0,0 +1,148 @@
+"""Write budget limiting how many DNS changes a sync may apply."""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional, Tuple
+
+from .cloudflare import RecordChange
+from .plan import SyncPlan
+
+logger = logging.getLogger(__name__)
+
+# Window used by the per-minute mutation limit.
+WINDOW_SECONDS = 60.0
+
+
+class UnsafeListingError(RuntimeError):
+    """Raised when a record listing cannot be trusted to build a plan from."""
+
+
+@dataclass(frozen=True)
+class GovernedPlan:
+    """A plan split into the changes to apply now and those deferred."""
+
+    allowed: SyncPlan
+    deferred: SyncPlan
+
+
+class ChangeGovernor:
+    """
+    Cap the DNS changes applied per run, per minute and per zone size.
+
+    Limits of zero are disabled. Changes beyond the budget are deferred in
+    priority order (creates, then updates, then deletes); the next cycle's
+    plan picks them up again. The fraction limits are relative to the number
+    of managed records in the current listing.
+    """
+
+    def __init__(
+        self,
+        max_per_run: int = 0,
+        max_per_minute: int = 0,
+        max_delete_fraction: float = 0.0,
+        max_change_fraction: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        allow_empty_listing: bool = False,
+    ) -> None:
+        self.max_per_run = max(max_per_run, 0)
+        self.max_per_minute = max(max_per_minute, 0)
+        self.max_delete_fraction = max(max_delete_fraction, 0.0)
+        self.max_change_fraction = max(max_change_fraction, 0.0)
+        self.clock = clock
+        self.allow_empty_listing = allow_empty_listing
+        self._recent: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+
+    def check_listing(self, listed: int, previous: Optional[int]) -> None:
+        """
+        Refuse an empty listing when the last full sync saw managed records.
+
+        Planning from it would recreate every record, duplicating those the
+        listing failed to return. ``allow_empty_listing`` trusts it anyway,
+        e.g. after the records were removed on purpose.
+        """
+        if listed or not previous:
+            return
+        if self.allow_empty_listing:
+            logger.warning(
+                "Cloudflare listing returned no records but the last full sync "
+                "saw %s; planning from it as allowed",
+                previous,
+            )
+            return
+        raise UnsafeListingError(
+            f"Cloudflare listing returned no records but the last full sync "
+            f"saw {previous}; refusing to plan from it. If the records were "
+            f"removed on purpose, run once with --allow-empty-listing"
+        )
+
+    def govern(self, plan: SyncPlan, existing: Optional[int] = None) -> GovernedPlan:
+        """
+        Split ``plan`` into allowed and deferred changes.
+
+        ``existing`` is the number of managed records the plan was built
+        from; pass None to skip the fraction limits, e.g. for single-device
+        reconciles.
+        """
+        budget = self._budget()
+        change_cap = delete_cap = math.inf
+        if existing is not None:
+            if self.max_change_fraction:
+                change_cap = math.ceil(existing * self.max_change_fraction)
+            if self.max_delete_fraction:
+                delete_cap = math.ceil(existing * self.max_delete_fraction)
+
+        creates = _take(plan.creates, budget)
+        budget -= len(creates)
+        updates = _take(plan.updates, min(budget, change_cap))
+        budget -= len(updates)
+        change_cap -= len(updates)
+        deletes = _take(plan.deletes, min(budget, change_cap, delete_cap))
+
+        allowed = SyncPlan(creates, updates, deletes)
+        deferred = SyncPlan(
+            plan.creates[len(creates) :],
+            plan.updates[len(updates) :],
+            plan.deletes[len(deletes) :],
+        )
+        if deferred:
+            logger.warning(
+                "Write budget deferred %s change(s) to later cycles: "
+                "%s create(s), %s update(s), %s delete(s)",
+                len(deferred),
+                len(deferred.creates),
+                len(deferred.updates),
+                len(deferred.deletes),
+            )
+        return GovernedPlan(allowed, deferred)
+
+    def record(self, mutations: int) -> None:
+        """Charge applied changes against the per-minute budget."""
+        if mutations and self.max_per_minute:
+            with self._lock:
+                self._recent.append((self.clock(), mutations))
+
+    def _budget(self) -> float:
+        """Return how many changes may be applied right now."""
+        budget: float = self.max_per_run or math.inf
+        if self.max_per_minute:
+            cutoff = self.clock() - WINDOW_SECONDS
+            with self._lock:
+                while self._recent and self._recent[0][0] <= cutoff:
+                    self._recent.popleft()
+                used = sum(count for _, count in self._recent)
+            budget = min(budget, max(self.max_per_minute - used, 0))
+        return budget
+
+
+def _take(changes: Tuple[RecordChange, ...], limit: float) -> Tuple[RecordChange, ...]:
+    """Return the first ``limit`` changes."""
+    if limit >= len(changes):
+        return changes
+    return changes[: max(int(limit), 0)]
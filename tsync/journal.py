@@ -0,0 +1,157 @@
+"""Persistent journal of failed record writes, retried before the next plan."""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .cloudflare import ChangeResult, RecordChange
+from .state import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+JournalKey = Tuple[str, str]
+
+
+@dataclass
+class JournalEntry:
+    """A record write that failed, with its payload and failure history."""
+
+    action: str
+    name: str
+    record_type: str
+    content: str = ""
+    record_id: Optional[str] = None
+    previous_content: Optional[str] = None
+    attempts: int = 1
+    last_error: str = ""
+    first_failed: float = 0.0
+    last_failed: float = 0.0
+
+    @property
+    def key(self) -> JournalKey:
+        """Return the (name, type) the entry is journaled under."""
+        return self.name, self.record_type
+
+    def describe(self) -> str:
+        """Return a one-line summary for logs and notifications."""
+        target = f" -> {self.content}" if self.content else ""
+        return (
+            f"{self.action} {self.record_type} {self.name}{target} "
+            f"({self.attempts} attempts: {self.last_error or 'unknown error'})"
+        )
+
+
+class WriteJournal:
+    """
+    Failed writes keyed by record name and type, saved after every change.
+
+    Each key holds the latest failed intent for that record. A later success
+    for the key clears it, and a later failure replaces the payload while
+    the attempt count keeps growing. Entries reaching ``max_attempts`` are
+    handed back by ``give_up`` instead of being retried again.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 5) -> None:
+        self.path = path
+        self.max_attempts = max(max_attempts, 1)
+        self.entries: Dict[JournalKey, JournalEntry] = {}
+
+    @classmethod
+    def load(cls, path: str, max_attempts: int = 5) -> "WriteJournal":
+        """Read the journal at ``path``, starting empty if unavailable."""
+        journal = cls(path, max_attempts)
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return journal
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable write journal %s: %s", path, exc)
+            return journal
+
+        known = {item.name for item in fields(JournalEntry)}
+        for item in data.get("entries") or ():
+            try:
+                entry = JournalEntry(**{k: v for k, v in item.items() if k in known})
+            except TypeError as exc:
+                logger.warning("Skipping malformed journal entry %r: %s", item, exc)
+                continue
+            journal.entries[entry.key] = entry
+        if journal.entries:
+            logger.info(
+                "Loaded %s failed writes from %s",
+                len(journal.entries),
+                path,
+            )
+        return journal
+
+    def save(self) -> None:
+        """Atomically write the journal to its path."""
+        write_json_atomic(
+            self.path,
+            {"entries": [asdict(entry) for entry in self.entries.values()]},
+        )
+
+    def names(self) -> List[str]:
+        """Return the journaled record names in insertion order."""
+        return list(dict.fromkeys(name for name, _ in self.entries))
+
+    def record(
+        self,
+        results: Iterable[ChangeResult],
+        errors: Optional[Mapping[JournalKey, str]] = None,
+    ) -> bool:
+        """
+        Clear keys written successfully and journal the failed changes.
+
+        ``errors`` maps (name, type) keys to their last error message. Returns
+        whether the journal changed.
+        """
+        failed: List[RecordChange] = []
+        changed = False
+        for change, ok in results:
+            if ok:
+                key = (change.name, change.record_type)
+                changed |= self.entries.pop(key, None) is not None
+            else:
+                failed.append(change)
+
+        now = time.time()
+        for change in failed:
+            key = (change.name, change.record_type)
+            previous = self.entries.get(key)
+            self.entries[key] = JournalEntry(
+                action=change.action,
+                name=change.name,
+                record_type=change.record_type,
+                content=change.content,
+                record_id=change.record_id,
+                previous_content=change.previous_content,
+                attempts=previous.attempts + 1 if previous is not None else 1,
+                last_error=(errors or {}).get(key, ""),
+                first_failed=previous.first_failed if previous is not None else now,
+                last_failed=now,
+            )
+            changed = True
+        return changed
+
+    def discard(self, keys: Set[JournalKey]) -> List[JournalEntry]:
+        """Drop entries whose key is in ``keys`` and return them."""
+        return [self.entries.pop(key) for key in list(self.entries) if key in keys]
+
+    def give_up(self) -> List[JournalEntry]:
+        """Remove and return entries that used up their attempts."""
+        return self.discard(
+            {
+                key
+                for key, entry in self.entries.items()
+                if entry.attempts >= self.max_attempts
+            }
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
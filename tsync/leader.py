@@ -0,0 +1,284 @@
+"""Leader election so only one of several replicas writes DNS records."""
+
+from __future__ import annotations
+
+import fcntl
+import logging
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import IO, Dict, List, Optional
+
+import requests
+
+from .cloudflare import CloudflareAPI
+
+logger = logging.getLogger(__name__)
+
+# Name of the lease record under the base domain.
+DEFAULT_LEASE_LABEL = "_tsync-leader"
+
+
+def default_holder_id() -> str:
+    """Return an identifier for this replica, unique per host and process."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaderElector(ABC):
+    """
+    Keep trying to become leader from a background thread.
+
+    Replicas that lose the election stay on standby and retry every third
+    of ``lease_seconds``, so a vacated lease is taken over within roughly
+    ``lease_seconds`` plus one retry. A leader that cannot renew for a whole
+    lease steps down on its own. Subclasses implement ``_try_acquire`` and
+    ``_release``.
+    """
+
+    name = ""
+
+    def __init__(self, holder_id: Optional[str] = None, lease_seconds: float = 60):
+        if lease_seconds <= 0:
+            raise ValueError("Leader lease must be greater than zero")
+        self.holder_id = holder_id or default_holder_id()
+        self.lease_seconds = lease_seconds
+        self.leader: Optional[str] = None
+        self._renewed = -float("inf")
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Return True while this replica holds an unexpired lease."""
+        with self._lock:
+            return time.monotonic() - self._renewed < self.lease_seconds
+
+    def start(self) -> None:
+        """Run one election round, then keep renewing in the background."""
+        self.poll()
+        self._thread = threading.Thread(
+            target=self._run,
+            name="tsync-leader",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop renewing and hand the lease back if held."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.is_leader:
+            try:
+                self._release()
+            except (OSError, requests.exceptions.RequestException) as exc:
+                logger.warning("Cannot release leader lease: %s", exc)
+            else:
+                logger.info("Released leadership")
+        with self._lock:
+            self._renewed = -float("inf")
+
+    def poll(self) -> bool:
+        """Try to acquire or renew the lease once; return whether held."""
+        was_leader = self.is_leader
+        started = time.monotonic()
+        try:
+            acquired = self._try_acquire()
+        except (OSError, requests.exceptions.RequestException) as exc:
+            logger.warning("Leader election via %s failed: %s", self.name, exc)
+            acquired = None
+
+        if acquired:
+            with self._lock:
+                self._renewed = started
+        elif acquired is False:
+            with self._lock:
+                self._renewed = -float("inf")
+
+        leader = self.is_leader
+        if leader and not was_leader:
+            logger.info("Became leader as %s via %s", self.holder_id, self.name)
+        elif was_leader and not leader:
+            logger.warning(
+                "Lost leadership%s",
+                f" to {self.leader}" if self.leader else "",
+            )
+        return leader
+
+    def _run(self) -> None:
+        """Renew or retry every third of the lease until stopped."""
+        while not self._stop.wait(self.lease_seconds / 3):
+            self.poll()
+
+    @abstractmethod
+    def _try_acquire(self) -> Optional[bool]:
+        """Return True if the lease is held, False if not, None if unknown."""
+
+    @abstractmethod
+    def _release(self) -> None:
+        """Give up a held lease."""
+
+
+class FileLockElector(LeaderElector):
+    """
+    Elect the replica holding an exclusive lock on a local file.
+
+    The operating system drops the lock when its holder exits, so failover
+    takes at most one retry interval. Only replicas sharing the file's host
+    (or a filesystem with reliable ``flock`` support) can take part.
+    """
+
+    name = "file lock"
+
+    def __init__(
+        self,
+        path: str,
+        holder_id: Optional[str] = None,
+        lease_seconds: float = 60,
+    ) -> None:
+        super().__init__(holder_id, lease_seconds)
+        self.path = path
+        self._handle: Optional[IO[str]] = None
+
+    def _try_acquire(self) -> bool:
+        if self._handle is not None:
+            return True
+        handle = open(self.path, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.seek(0)
+            self.leader = handle.read().strip() or None
+            handle.close()
+            return False
+        except OSError:
+            handle.close()
+            raise
+        handle.truncate(0)
+        handle.write(self.holder_id)
+        handle.flush()
+        self._handle = handle
+        self.leader = self.holder_id
+        return True
+
+    def _release(self) -> None:
+        if self._handle is not None:
+            self._handle.truncate(0)
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+
+class CloudflareLeaseElector(LeaderElector):
+    """
+    Elect the replica named in a TXT lease record in the Cloudflare zone.
+
+    The leader rewrites the record with a fresh timestamp on every renewal.
+    Standbys time the lease with their own clock from the last change they
+    observed, so clock skew between hosts does not matter; a replica that
+    just started waits a full lease before taking over. Cloudflare has no
+    compare-and-swap, so every write is read back and concurrent creations
+    are settled in favour of the oldest record.
+    """
+
+    name = "Cloudflare lease"
+
+    def __init__(
+        self,
+        cloudflare: CloudflareAPI,
+        record_name: Optional[str] = None,
+        holder_id: Optional[str] = None,
+        lease_seconds: float = 60,
+    ) -> None:
+        super().__init__(holder_id, lease_seconds)
+        self.cloudflare = cloudflare
+        self.record_name = (
+            record_name or f"{DEFAULT_LEASE_LABEL}.{cloudflare.base_domain}"
+        )
+        self._seen_content: Optional[str] = None
+        self._seen_at = 0.0
+
+    def _try_acquire(self) -> Optional[bool]:
+        records = self._records()
+        if not records:
+            if not self.cloudflare.create_dns_record(
+                self.record_name,
+                self._content(),
+                "TXT",
+            ):
+                return None
+            return self._settle()
+
+        record = records[0]
+        holder = _holder(record)
+        self.leader = holder
+        if holder == self.holder_id:
+            if not self.cloudflare.update_dns_record(
+                record["id"],
+                self.record_name,
+                self._content(),
+                "TXT",
+            ):
+                return None
+            return self._settle()
+
+        if record["content"] != self._seen_content:
+            self._seen_content = record["content"]
+            self._seen_at = time.monotonic()
+            return False
+        if time.monotonic() - self._seen_at < self.lease_seconds:
+            return False
+
+        logger.info("Lease of %s expired; taking over", holder or "unknown holder")
+        if not self.cloudflare.update_dns_record(
+            record["id"],
+            self.record_name,
+            self._content(),
+            "TXT",
+        ):
+            return None
+        return self._settle()
+
+    def _release(self) -> None:
+        for record in self._records():
+            if _holder(record) == self.holder_id:
+                self.cloudflare.delete_dns_record(
+                    record["id"], self.record_name, "TXT"
+                )
+
+    def _settle(self) -> bool:
+        """Read the lease back and keep only the oldest record."""
+        records = self._records()
+        if not records:
+            return False
+        for extra in records[1:]:
+            if _holder(extra) == self.holder_id:
+                self.cloudflare.delete_dns_record(
+                    extra["id"], self.record_name, "TXT"
+                )
+        self.leader = _holder(records[0])
+        return self.leader == self.holder_id
+
+    def _records(self) -> List[Dict]:
+        """Return the lease records, oldest first."""
+        records = self.cloudflare.find_dns_records(self.record_name, "TXT")
+        return sorted(
+            records,
+            key=lambda record: (record.get("created_on") or "", record["id"]),
+        )
+
+    def _content(self) -> str:
+        # Sub-second precision so every renewal changes the content.
+        return f"holder={self.holder_id} renewed={time.time():.3f}"
+
+
+def _holder(record: Dict) -> Optional[str]:
+    """Return the holder named in a lease record's content."""
+    for part in record.get("content", "").strip('"').split():
+        key, _, value = part.partition("=")
+        if key == "holder":
+            return value
+    return None
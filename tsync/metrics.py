@@ -0,0 +1,323 @@
+"""Prometheus metrics for sync cycles and API calls."""
+
+from __future__ import annotations
+
+import logging
+import math
+import threading
+from abc import ABC, abstractmethod
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+
+from .state import write_text_atomic
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric(ABC):
+    """Base class for a metric family with a fixed set of label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"'
+            for name, value in zip(self.label_names, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Return exposition lines for every labelled series."""
+
+    def render(self) -> List[str]:
+        """Return the HELP/TYPE header and samples."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self.samples(),
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        """Increase the series selected by ``labels``."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{self._format_labels(key)} {_number(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        """Set the series selected by ``labels``."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        """Record one observation."""
+        key = self._key(labels)
+        with self._lock:
+            # Per-bucket counts followed by the running count and sum.
+            series = self._series.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines: List[str] = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                labels = self._format_labels(key, f'le="{_number(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {_number(count)}")
+            labels = self._format_labels(key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {_number(series[-2])}")
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_count{labels} {_number(series[-2])}")
+            lines.append(f"{self.name}_sum{labels} {_number(series[-1])}")
+        return lines
+
+
+class Metrics:
+    """The metric families tsync exports, plus hooks to record them."""
+
+    def __init__(self) -> None:
+        self.api_requests = Counter(
+            "tsync_api_requests_total",
+            "API requests sent, by API, endpoint, method and status code.",
+            ("api", "endpoint", "method", "status"),
+        )
+        self.api_latency = Histogram(
+            "tsync_api_request_duration_seconds",
+            "API request latency.",
+            ("api", "endpoint"),
+        )
+        self.api_retries = Counter(
+            "tsync_api_retries_total",
+            "API requests retried after a 429, 5xx or connection error.",
+            ("api", "endpoint"),
+        )
+        self.rate_limit_wait = Counter(
+            "tsync_rate_limit_wait_seconds_total",
+            "Time spent waiting for the client-side rate limiter.",
+            ("api",),
+        )
+        self.phase_duration = Histogram(
+            "tsync_sync_phase_duration_seconds",
+            "Duration of each sync phase.",
+            ("phase",),
+        )
+        self.cycle_duration = Histogram(
+            "tsync_sync_duration_seconds",
+            "Duration of complete sync cycles.",
+            ("target",),
+        )
+        self.cycles = Counter(
+            "tsync_sync_cycles_total",
+            "Sync cycles by result.",
+            ("target", "result"),
+        )
+        self.devices = Gauge(
+            "tsync_devices",
+            "Tailscale devices remaining after filtering.",
+            ("tailnet",),
+        )
+        self.changes = Counter(
+            "tsync_dns_changes_total",
+            "DNS record changes applied, by action and result.",
+            ("action", "result"),
+        )
+        self.deferred = Counter(
+            "tsync_dns_changes_deferred_total",
+            "DNS record changes deferred by the write budget, by action.",
+            ("action",),
+        )
+        self.notifications = Counter(
+            "tsync_notifications_total",
+            "Notifications by outcome: sent, or dropped_failed, dropped_overflow "
+            "and dropped_shutdown.",
+            ("result",),
+        )
+        self.notification_latency = Histogram(
+            "tsync_notification_delivery_seconds",
+            "Time from queueing a notification to its delivery, retries included.",
+        )
+        self.leader = Gauge(
+            "tsync_leader",
+            "1 while this replica holds the leader lease, 0 on standby.",
+        )
+        self.interval = Gauge(
+            "tsync_sync_interval_seconds",
+            "Seconds the daemon waits between sync cycles.",
+        )
+        self.last_success = Gauge(
+            "tsync_last_success_timestamp_seconds",
+            "Unix time of the last successful sync.",
+            ("target",),
+        )
+        self._families: List[_Metric] = [
+            self.api_requests,
+            self.api_latency,
+            self.api_retries,
+            self.rate_limit_wait,
+            self.phase_duration,
+            self.cycle_duration,
+            self.cycles,
+            self.devices,
+            self.changes,
+            self.deferred,
+            self.notifications,
+            self.notification_latency,
+            self.leader,
+            self.interval,
+            self.last_success,
+        ]
+
+    def add(self, metric: _Metric) -> _Metric:
+        """Register an additional metric family for export."""
+        self._families.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for family in self._families:
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str) -> None:
+        """Atomically write metrics for the node-exporter textfile collector."""
+        write_text_atomic(path, self.render())
+
+
+class MetricsServer:
+    """Serve ``/metrics`` over HTTP from a background thread."""
+
+    def __init__(self, metrics: Metrics, host: str = "0.0.0.0", port: int = 9100):
+        self.metrics = metrics
+        self._httpd = ThreadingHTTPServer((host, port), self._request_handler())
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            name="tsync-metrics",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        """Start serving."""
+        self._thread.start()
+        host, port = self._httpd.server_address[:2]
+        logger.info("Serving metrics on http://%s:%s/metrics", host, port)
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def _request_handler(self) -> type:
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            """Answer scrapes of /metrics."""
+
+            def do_GET(self) -> None:  # noqa: N802
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                logger.debug("Metrics %s - %s", self.address_string(), format % args)
+
+        return Handler
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
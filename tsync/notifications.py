@@ -3,10 +3,20 @@
 from __future__ import annotations
 
 import logging
-from typing import List, Optional
+import math
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
 import requests
 
+from .transport import HTTPTransport
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,10 +27,12 @@ class NotificationService:
         self,
         ntfy_topic: Optional[str] = None,
         ntfy_server: str = "https://ntfy.sh",
+        transport: Optional[HTTPTransport] = None,
     ) -> None:
         self.ntfy_topic = ntfy_topic
         self.ntfy_server = ntfy_server.rstrip("/")
         self.enabled = bool(ntfy_topic)
+        self.transport = transport or HTTPTransport()
 
     def send_notification(
         self,
@@ -46,8 +58,10 @@ class NotificationService:
             headers["X-Tags"] = ",".join(tags)
 
         try:
-            response = requests.post(
+            response = self.transport.post(
                 url,
+                api="ntfy",
+                endpoint="publish",
                 data=message.encode("utf-8"),
                 headers=headers,
                 timeout=10,
@@ -66,32 +80,434 @@ class NotificationService:
         updated: int,
         deleted: int,
         dry_run: bool = False,
+        target: Optional[str] = None,
     ) -> bool:
         """Send a summary notification when synchronization succeeds."""
-        mode = "DRY RUN" if dry_run else "SYNC"
-        title = f"Tailscale DNS {mode} Complete"
-
-        if created == 0 and updated == 0 and deleted == 0:
-            message = "No DNS changes were required."
-            tags = ["success"]
-        else:
-            changes = []
-            if created > 0:
-                changes.append(f"{created} created")
-            if updated > 0:
-                changes.append(f"{updated} updated")
-            if deleted > 0:
-                changes.append(f"{deleted} deleted")
-            message = f"DNS records {', '.join(changes)} successfully."
-            tags = ["info", "dns"]
-
-        return self.send_notification(message, title, tags)
-
-    def send_sync_failure(self, error_msg: str, dry_run: bool = False) -> bool:
+        message = _success_message(created, updated, deleted, dry_run, target)
+        return self.send_notification(
+            message.message,
+            message.title,
+            message.tags,
+            message.priority,
+        )
+
+    def send_sync_failure(
+        self,
+        error_msg: str,
+        dry_run: bool = False,
+        target: Optional[str] = None,
+    ) -> bool:
         """Send an error notification when synchronization fails."""
-        mode = "DRY RUN" if dry_run else "SYNC"
-        title = f"Tailscale DNS {mode} Failed"
-        message = f"Synchronization failed: {error_msg}"
-        tags = ["error", "warning"]
+        message = _failure_message(error_msg, dry_run, target)
+        return self.send_notification(
+            message.message,
+            message.title,
+            message.tags,
+            message.priority,
+        )
+
+    def send_writes_abandoned(
+        self,
+        writes: List[str],
+        target: Optional[str] = None,
+    ) -> bool:
+        """Send a warning listing record writes that were given up on."""
+        message = _abandoned_message(writes, target)
+        return self.send_notification(
+            message.message,
+            message.title,
+            message.tags,
+            message.priority,
+        )
+
+
+@dataclass
+class _Message:
+    """A notification waiting for delivery."""
+
+    message: str
+    title: Optional[str] = None
+    tags: Optional[List[str]] = None
+    priority: int = 3
+    queued: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Event:
+    """The outcome of one sync cycle, before it is turned into a message."""
+
+    target: Optional[str]
+    dry_run: bool
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+    queued: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Digest:
+    """Cycle outcomes of one target and kind merged since a window opened."""
+
+    opened: float
+    cycles: int = 0
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+    dry_run: bool = False
+    queued: Optional[float] = None
+
+
+class NotificationQueue:
+    """
+    Deliver notifications from a background thread so syncs never wait.
+
+    Messages are retried with exponential backoff and dropped once the
+    attempts run out or the queue is full. With a ``digest_interval``, sync
+    outcomes are throttled per target: the first success or failure in a
+    window is sent at once, and later ones are merged into a digest sent
+    when the window closes, e.g. "12 cycles, 34 changes in the last 1h".
+    """
+
+    def __init__(
+        self,
+        service: NotificationService,
+        digest_interval: float = 0,
+        max_queue: int = 100,
+        max_attempts: int = 5,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+        metrics: Optional["Metrics"] = None,
+    ) -> None:
+        self.service = service
+        self.enabled = service.enabled
+        self.digest_interval = max(digest_interval, 0)
+        self.max_attempts = max(max_attempts, 1)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.metrics = metrics
+        self.sent = 0
+        self.dropped = 0
+        self.latency = 0.0
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=max(max_queue, 1))
+        self._closing = threading.Event()
+        self._digests: Dict[Tuple[Optional[str], str], _Digest] = {}
+        self._thread = threading.Thread(
+            target=self._run,
+            name="tsync-notify",
+            daemon=True,
+        )
+        if self.enabled:
+            self._thread.start()
+
+    def send_notification(
+        self,
+        message: str,
+        title: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        priority: int = 3,
+    ) -> bool:
+        """Queue a raw notification; return False if it was dropped."""
+        return self._put(_Message(message, title, tags, priority))
+
+    def send_sync_success(
+        self,
+        created: int,
+        updated: int,
+        deleted: int,
+        dry_run: bool = False,
+        target: Optional[str] = None,
+    ) -> bool:
+        """Queue the outcome of a successful sync."""
+        return self._put(_Event(target, dry_run, created, updated, deleted))
+
+    def send_sync_failure(
+        self,
+        error_msg: str,
+        dry_run: bool = False,
+        target: Optional[str] = None,
+    ) -> bool:
+        """Queue the outcome of a failed sync."""
+        return self._put(_Event(target, dry_run, error=error_msg))
+
+    def send_writes_abandoned(
+        self,
+        writes: List[str],
+        target: Optional[str] = None,
+    ) -> bool:
+        """Queue a warning about abandoned writes; these are never digested."""
+        return self._put(_abandoned_message(writes, target))
+
+    def close(self, timeout: float = 10.0) -> None:
+        """
+        Flush pending digests and deliver what is queued, then stop.
+
+        Retries are not waited for while closing, and anything still
+        undelivered after ``timeout`` seconds is dropped.
+        """
+        if not self.enabled or self._closing.is_set():
+            return
+        self._closing.set()
+        try:
+            # Wake the worker if it is waiting for work.
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Notification delivery did not finish within %ss", timeout)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._drop("shutdown")
+        self.log_stats()
+
+    def log_stats(self) -> None:
+        """Log how many notifications were delivered and dropped."""
+        if not self.sent and not self.dropped:
+            return
+        logger.info(
+            "Notifications: %s sent (%.2fs mean delivery latency), %s dropped",
+            self.sent,
+            self.latency / self.sent if self.sent else 0.0,
+            self.dropped,
+        )
+
+    def _put(self, item: object) -> bool:
+        """Queue ``item`` without blocking."""
+        if not self.enabled:
+            logger.debug("Notifications disabled because NTFY_TOPIC is not set")
+            return True
+        if self._closing.is_set():
+            self._drop("shutdown")
+            return False
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            logger.warning("Notification queue is full; dropping a notification")
+            self._drop("overflow")
+            return False
+        return True
+
+    def _run(self) -> None:
+        """Worker loop: deliver queued items and close digest windows."""
+        while not self._closing.is_set():
+            try:
+                items = [self._queue.get(timeout=self._next_flush())]
+            except queue.Empty:
+                items = []
+            # Take everything that queued up during a slow delivery at once,
+            # so a backlog is merged instead of sent message by message.
+            self._process(items + self._drain())
+            self._flush(time.monotonic())
+
+        # Shutting down: drain the queue and send every pending digest.
+        self._process(self._drain())
+        self._flush(math.inf)
+
+    def _drain(self) -> List[object]:
+        """Return the queued items without waiting."""
+        items: List[object] = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                return items
+
+    def _process(self, items: List[object]) -> None:
+        """Merge sync outcomes into digests and deliver the rest."""
+        outbox = [self._handle(item) for item in items if item is not None]
+        for message in outbox:
+            if message is not None:
+                self._deliver(message)
+
+    def _next_flush(self) -> float:
+        """Return how long the worker may sleep before a window closes."""
+        if not self._digests:
+            return 1.0
+        closes = min(digest.opened for digest in self._digests.values())
+        remaining = closes + self.digest_interval - time.monotonic()
+        return min(max(remaining, 0.0), 1.0)
+
+    def _handle(self, item: object) -> Optional[_Message]:
+        """Return the message to send for ``item``, or merge it into a digest."""
+        if isinstance(item, _Message):
+            return item
+        assert isinstance(item, _Event)
+        if not self.digest_interval:
+            return _event_message(item)
+
+        key = (item.target, "failure" if item.error is not None else "success")
+        digest = self._digests.get(key)
+        if digest is None:
+            # Nothing sent recently: report at once and open a window.
+            self._digests[key] = _Digest(opened=time.monotonic())
+            return _event_message(item)
+        digest.cycles += 1
+        digest.created += item.created
+        digest.updated += item.updated
+        digest.deleted += item.deleted
+        digest.error = item.error
+        digest.dry_run = item.dry_run
+        if digest.queued is None:
+            digest.queued = item.queued
+        return None
+
+    def _flush(self, now: float) -> None:
+        """Send the digests whose window has closed."""
+        for key, digest in list(self._digests.items()):
+            if digest.opened + self.digest_interval > now:
+                continue
+            if not digest.cycles:
+                del self._digests[key]
+                continue
+            opened = time.monotonic()
+            self._digests[key] = _Digest(opened=opened)
+            self._deliver(_digest_message(key[0], digest, opened - digest.opened))
+
+    def _deliver(self, message: _Message) -> None:
+        """Send ``message``, retrying with exponential backoff."""
+        for attempt in range(self.max_attempts):
+            if self.service.send_notification(
+                message.message,
+                message.title,
+                message.tags,
+                message.priority,
+            ):
+                latency = time.monotonic() - message.queued
+                self.sent += 1
+                self.latency += latency
+                if self.metrics is not None:
+                    self.metrics.notifications.inc(result="sent")
+                    self.metrics.notification_latency.observe(latency)
+                return
+            if self._closing.is_set() or attempt + 1 == self.max_attempts:
+                break
+            delay = min(self.backoff_base * 2**attempt, self.backoff_max)
+            logger.info("Retrying notification in %.1fs", delay)
+            # Closing wakes the wait early; the loop then gives up.
+            self._closing.wait(delay)
+
+        logger.warning("Dropping notification %r after failed delivery", message.title)
+        self._drop("failed")
+
+    def _drop(self, reason: str) -> None:
+        """Count a notification that will not be delivered."""
+        self.dropped += 1
+        if self.metrics is not None:
+            self.metrics.notifications.inc(result=f"dropped_{reason}")
+
+
+def _success_message(
+    created: int,
+    updated: int,
+    deleted: int,
+    dry_run: bool,
+    target: Optional[str],
+) -> _Message:
+    """Build the summary sent when synchronization succeeds."""
+    mode = "DRY RUN" if dry_run else "SYNC"
+    title = _with_target(f"Tailscale DNS {mode} Complete", target)
+
+    if created == 0 and updated == 0 and deleted == 0:
+        return _Message("No DNS changes were required.", title, ["success"])
+    changes = _change_summary(created, updated, deleted)
+    return _Message(f"DNS records {changes} successfully.", title, ["info", "dns"])
+
+
+def _failure_message(error_msg: str, dry_run: bool, target: Optional[str]) -> _Message:
+    """Build the error sent when synchronization fails."""
+    mode = "DRY RUN" if dry_run else "SYNC"
+    title = _with_target(f"Tailscale DNS {mode} Failed", target)
+    message = f"Synchronization failed: {error_msg}"
+    return _Message(message, title, ["error", "warning"], priority=4)
+
+
+def _abandoned_message(writes: List[str], target: Optional[str]) -> _Message:
+    """Build the warning sent when journaled writes are given up on."""
+    count = f"{len(writes)} DNS write{'s' if len(writes) != 1 else ''}"
+    message = f"Gave up retrying {count}:\n" + "\n".join(
+        f"- {write}" for write in writes
+    )
+    title = _with_target("Tailscale DNS Writes Abandoned", target)
+    return _Message(message, title, ["error", "warning"], priority=4)
+
+
+def _event_message(event: _Event) -> _Message:
+    """Build the message for a single sync outcome."""
+    if event.error is not None:
+        message = _failure_message(event.error, event.dry_run, event.target)
+    else:
+        message = _success_message(
+            event.created,
+            event.updated,
+            event.deleted,
+            event.dry_run,
+            event.target,
+        )
+    message.queued = event.queued
+    return message
+
+
+def _digest_message(
+    target: Optional[str],
+    digest: _Digest,
+    window: float,
+) -> _Message:
+    """Build the message summarising the outcomes merged into ``digest``."""
+    mode = "DRY RUN" if digest.dry_run else "SYNC"
+    since = f"in the last {_format_duration(window)}"
+    cycles = f"{digest.cycles} cycle{'s' if digest.cycles != 1 else ''}"
+    if digest.error is not None:
+        message = _Message(
+            f"{cycles} failed {since}. Latest error: {digest.error}",
+            _with_target(f"Tailscale DNS {mode} Failures", target),
+            ["error", "warning"],
+            priority=4,
+        )
+    else:
+        total = digest.created + digest.updated + digest.deleted
+        text = f"{cycles}, {total} change{'s' if total != 1 else ''} {since}"
+        if total:
+            summary = _change_summary(digest.created, digest.updated, digest.deleted)
+            text += f" ({summary})"
+        message = _Message(
+            f"{text}.",
+            _with_target(f"Tailscale DNS {mode} Digest", target),
+            ["info", "dns"],
+        )
+    message.queued = digest.queued or message.queued
+    return message
+
+
+def _change_summary(created: int, updated: int, deleted: int) -> str:
+    """Describe non-zero change counts, e.g. ``2 created, 1 deleted``."""
+    changes = []
+    if created > 0:
+        changes.append(f"{created} created")
+    if updated > 0:
+        changes.append(f"{updated} updated")
+    if deleted > 0:
+        changes.append(f"{deleted} deleted")
+    return ", ".join(changes)
+
+
+def _format_duration(seconds: float) -> str:
+    """Format a window length such as ``1h`` or ``1h 30m``."""
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = [
+        f"{value}{unit}"
+        for value, unit in ((hours, "h"), (minutes, "m"), (secs, "s"))
+        if value
+    ]
+    return " ".join(parts) or "0s"
+
 
-        return self.send_notification(message, title, tags, priority=4)
+def _with_target(title: str, target: Optional[str]) -> str:
+    """Prefix a notification title with the sync target name."""
+    return f"[{target}] {title}" if target else title
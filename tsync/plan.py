@@ -0,0 +1,213 @@
+"""Pure planning stage diffing desired DNS records against current ones."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import (
+    AbstractSet,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from .cloudflare import RecordChange
+
+RecordKey = Tuple[str, str]
+
+# Classifies a raw record as owned (True), unmarked (None) or foreign (False).
+Ownership = Callable[[Dict], Optional[bool]]
+
+
+@dataclass(frozen=True)
+class CurrentRecord:
+    """The parts of an existing Cloudflare record the planner needs."""
+
+    record_id: str
+    content: str
+    owned: bool = True
+
+
+class RecordIndex:
+    """
+    Existing records under a base domain, keyed by (name, type).
+
+    The base-domain suffix is computed once, so classifying a record costs a
+    couple of string comparisons instead of a replace per record. Extra
+    records sharing a key are kept aside so the plan can remove them. When
+    ``record_types`` is given, records of other types are ignored, so one
+    unfiltered listing can feed every managed type. Unowned records are
+    indexed so the plan can claim them, but are never deleted.
+    """
+
+    __slots__ = ("suffix", "include_wildcards", "record_types", "records", "duplicates")
+
+    def __init__(
+        self,
+        base_domain: str,
+        include_wildcards: bool = True,
+        record_types: Optional[AbstractSet[str]] = None,
+    ) -> None:
+        self.suffix = f".{base_domain}"
+        self.include_wildcards = include_wildcards
+        self.record_types = record_types
+        self.records: Dict[RecordKey, CurrentRecord] = {}
+        self.duplicates: List[Tuple[RecordKey, CurrentRecord]] = []
+
+    def add(
+        self,
+        name: str,
+        record_type: str,
+        record_id: str,
+        content: str,
+        owned: bool = True,
+    ) -> bool:
+        """Index a record if it is managed; return whether it was kept."""
+        if self.record_types is not None and record_type not in self.record_types:
+            return False
+        if not name.endswith(self.suffix) or len(name) == len(self.suffix):
+            return False
+        if not self.include_wildcards and name.startswith("*."):
+            return False
+
+        key = (name, record_type)
+        record = CurrentRecord(record_id, content, owned)
+        if key in self.records:
+            self.duplicates.append((key, record))
+        else:
+            self.records[key] = record
+        return True
+
+    def add_all(
+        self,
+        records: Iterable[Dict],
+        owns: Optional[Ownership] = None,
+    ) -> "RecordIndex":
+        """Index raw Cloudflare API records, skipping those ``owns`` rejects."""
+        for record in records:
+            owned = owns(record) if owns is not None else True
+            if owned is False:
+                continue
+            self.add(
+                record["name"],
+                record["type"],
+                record["id"],
+                record["content"],
+                bool(owned),
+            )
+        return self
+
+    def __len__(self) -> int:
+        return len(self.records) + len(self.duplicates)
+
+
+@dataclass(frozen=True)
+class SyncPlan:
+    """Immutable set of record changes that reconcile a zone."""
+
+    creates: Tuple[RecordChange, ...] = ()
+    updates: Tuple[RecordChange, ...] = ()
+    deletes: Tuple[RecordChange, ...] = ()
+
+    @property
+    def changes(self) -> Tuple[RecordChange, ...]:
+        """Return every change, creates and updates before deletes."""
+        return self.creates + self.updates + self.deletes
+
+    def __len__(self) -> int:
+        return len(self.creates) + len(self.updates) + len(self.deletes)
+
+
+def desired_records(
+    mappings: Mapping[str, str],
+    base_domain: str,
+    create_wildcard_records: bool,
+    record_type: str = "A",
+) -> Dict[RecordKey, str]:
+    """Expand hostname mappings into the records that should exist."""
+    suffix = f".{base_domain}"
+    desired: Dict[RecordKey, str] = {}
+    for hostname, content in mappings.items():
+        name = hostname + suffix
+        desired[(name, record_type)] = content
+        if create_wildcard_records:
+            desired[("*." + name, record_type)] = content
+    return desired
+
+
+def desired_address_records(
+    addresses: Mapping[str, Mapping[str, str]],
+    base_domain: str,
+    create_wildcard_records: bool,
+) -> Dict[RecordKey, str]:
+    """Expand per-type hostname mappings, e.g. ``{"A": {...}, "AAAA": {...}}``."""
+    desired: Dict[RecordKey, str] = {}
+    for record_type, mappings in addresses.items():
+        desired.update(
+            desired_records(mappings, base_domain, create_wildcard_records, record_type)
+        )
+    return desired
+
+
+def build_plan(
+    desired: Mapping[RecordKey, Optional[str]],
+    current: RecordIndex,
+    prune: bool = True,
+) -> SyncPlan:
+    """
+    Diff desired records against the current index in linear time.
+
+    A desired value of None removes the record. With ``prune`` set, indexed
+    records missing from ``desired`` are deleted as well. Unowned records
+    are never deleted; desired ones are updated to claim them.
+    """
+    creates: List[RecordChange] = []
+    updates: List[RecordChange] = []
+    deletes: List[RecordChange] = []
+    existing = current.records
+
+    for key, content in desired.items():
+        name, record_type = key
+        record = existing.get(key)
+        if content is None:
+            if record is not None and record.owned:
+                deletes.append(_delete(name, record_type, record))
+        elif record is None:
+            creates.append(RecordChange("create", name, content, None, record_type))
+        elif record.content != content or not record.owned:
+            updates.append(
+                RecordChange(
+                    "update",
+                    name,
+                    content,
+                    record.record_id,
+                    record_type,
+                    record.content,
+                )
+            )
+
+    if prune:
+        for key, record in existing.items():
+            if key not in desired and record.owned:
+                deletes.append(_delete(key[0], key[1], record))
+
+    for (name, record_type), record in current.duplicates:
+        if record.owned and (prune or (name, record_type) in desired):
+            deletes.append(_delete(name, record_type, record))
+
+    return SyncPlan(tuple(creates), tuple(updates), tuple(deletes))
+
+
+def _delete(name: str, record_type: str, record: CurrentRecord) -> RecordChange:
+    """Build a delete change for an existing record."""
+    return RecordChange(
+        "delete",
+        name,
+        "",
+        record.record_id,
+        record_type,
+        record.content,
+    )
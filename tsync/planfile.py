@@ -0,0 +1,109 @@
+"""Saving reviewed sync plans to disk and loading them back for apply."""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .cloudflare import RecordChange
+from .plan import SyncPlan
+from .state import write_json_atomic
+
+PLAN_VERSION = 1
+
+
+class StalePlanError(RuntimeError):
+    """Raised when the records a saved plan touches changed since planning."""
+
+
+@dataclass(frozen=True)
+class SavedPlan:
+    """A plan read from disk, with the zone it was computed against."""
+
+    zone_id: str
+    base_domain: str
+    owner: Optional[str]
+    created: str
+    plan: SyncPlan
+
+
+def write_plan(
+    path: str,
+    plan: SyncPlan,
+    zone_id: str,
+    base_domain: str,
+    owner: Optional[str] = None,
+) -> None:
+    """
+    Atomically write ``plan`` as compact JSON.
+
+    Each change is stored as ``[action, type, name, content, record_id,
+    previous_content]``, so updates and deletes carry the record ID and the
+    content they expect to find when the plan is applied.
+    """
+    write_json_atomic(
+        path,
+        {
+            "version": PLAN_VERSION,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "zone_id": zone_id,
+            "base_domain": base_domain,
+            "owner": owner,
+            "changes": [
+                [
+                    change.action,
+                    change.record_type,
+                    change.name,
+                    change.content,
+                    change.record_id,
+                    change.previous_content,
+                ]
+                for change in plan.changes
+            ],
+        },
+    )
+
+
+def read_plan(path: str) -> SavedPlan:
+    """Load a plan written by ``write_plan``; raise ValueError if malformed."""
+    with open(path, "r", encoding="utf-8") as handle:
+        try:
+            data = json.load(handle)
+        except ValueError as exc:
+            raise ValueError(f"Plan file {path} is not valid JSON: {exc}") from exc
+
+    if not isinstance(data, dict) or data.get("version") != PLAN_VERSION:
+        raise ValueError(f"Plan file {path} has an unsupported format")
+
+    changes: List[RecordChange] = []
+    for item in data.get("changes") or ():
+        try:
+            action, record_type, name, content, record_id, previous = item
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Malformed change {item!r} in {path}") from exc
+        if action not in {"create", "update", "delete"}:
+            raise ValueError(f"Unknown action {action!r} in {path}")
+        if action != "create" and not record_id:
+            raise ValueError(f"Planned {action} of {name} in {path} has no record ID")
+        changes.append(
+            RecordChange(action, name, content, record_id, record_type, previous)
+        )
+
+    return SavedPlan(
+        zone_id=str(data.get("zone_id") or ""),
+        base_domain=str(data.get("base_domain") or ""),
+        owner=data.get("owner"),
+        created=str(data.get("created") or "unknown"),
+        plan=split_plan(changes),
+    )
+
+
+def split_plan(changes: List[RecordChange]) -> SyncPlan:
+    """Group ``changes`` by action into a plan, keeping their order."""
+    return SyncPlan(
+        tuple(change for change in changes if change.action == "create"),
+        tuple(change for change in changes if change.action == "update"),
+        tuple(change for change in changes if change.action == "delete"),
+    )
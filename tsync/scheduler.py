@@ -0,0 +1,175 @@
+"""Interval scheduler driving tsync's long-running daemon mode."""
+
+from __future__ import annotations
+
+import logging
+import random
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+# Below this share of rate-limit quota left, cycles are spaced out further.
+QUOTA_LOW = 0.2
+
+
+@dataclass
+class CycleReport:
+    """What a cycle did, used to adapt the interval before the next one."""
+
+    ok: bool
+    changes: int = 0
+    quota: Optional[float] = None
+
+    @property
+    def busy(self) -> bool:
+        """Return True when the cycle changed records or failed."""
+        return not self.ok or self.changes > 0
+
+
+class IntervalScheduler:
+    """
+    Run a sync cycle on a schedule until asked to stop.
+
+    Cycles run on the calling thread, so they never overlap. When a cycle
+    overruns its slot the missed slots are skipped rather than queued.
+
+    With ``min_interval`` and ``max_interval`` left unset the interval is
+    fixed. Otherwise it adapts: a cycle that changed records or failed drops
+    it to ``min_interval``, every quiet cycle doubles it up to
+    ``max_interval``, and a rate-limit quota below ``QUOTA_LOW`` doubles it
+    even after busy cycles. ``jitter`` spreads each wait by up to that
+    fraction of the interval, so replicas drift apart.
+    """
+
+    def __init__(
+        self,
+        interval: float,
+        stop_event: Optional[threading.Event] = None,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        jitter: float = 0.0,
+        metrics: Optional["Metrics"] = None,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("Interval must be greater than zero")
+        self.min_interval = interval if min_interval is None else min_interval
+        self.max_interval = interval if max_interval is None else max_interval
+        if self.min_interval <= 0:
+            raise ValueError("Minimum interval must be greater than zero")
+        if self.min_interval > self.max_interval:
+            raise ValueError("Minimum interval cannot exceed the maximum interval")
+        if not 0 <= jitter < 1:
+            raise ValueError("Interval jitter must be at least 0 and below 1")
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.jitter = jitter
+        self.metrics = metrics
+        self.stop_event = stop_event or threading.Event()
+        self.cycles = 0
+
+    @property
+    def adaptive(self) -> bool:
+        """Return True when the interval can change between cycles."""
+        return self.min_interval < self.max_interval
+
+    def install_signal_handlers(self) -> None:
+        """Stop gracefully on SIGTERM and SIGINT."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+
+    def stop(self) -> None:
+        """Ask the scheduler to exit after the current cycle."""
+        self.stop_event.set()
+
+    def run(self, cycle: Callable[[], Union[bool, CycleReport]]) -> None:
+        """
+        Call ``cycle`` on schedule until stopped.
+
+        ``cycle`` returns whether it succeeded, or a ``CycleReport`` whose
+        changes and quota steer an adaptive interval.
+        """
+        next_run = time.monotonic()
+        self._observe_interval()
+
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            drift = started - next_run
+            self.cycles += 1
+
+            report = cycle()
+            if not isinstance(report, CycleReport):
+                report = CycleReport(ok=bool(report))
+            previous = self.interval
+            self.interval = self._next_interval(report)
+            self._observe_interval()
+
+            duration = time.monotonic() - started
+            logger.info(
+                "Cycle %s %s in %.2fs (started %.2fs behind schedule); "
+                "next in %gs%s",
+                self.cycles,
+                "finished" if report.ok else "failed",
+                duration,
+                drift,
+                self.interval,
+                _interval_change(previous, self.interval),
+            )
+
+            next_run += self._spread(self.interval)
+            now = time.monotonic()
+            if next_run <= now:
+                skipped = int((now - next_run) // self.interval) + 1
+                logger.warning(
+                    "Cycle overran its interval; skipping %s scheduled run(s)",
+                    skipped,
+                )
+                next_run += skipped * self.interval
+
+            self.stop_event.wait(max(next_run - time.monotonic(), 0))
+
+        logger.info("Scheduler stopped after %s cycle(s)", self.cycles)
+
+    def _next_interval(self, report: CycleReport) -> float:
+        """Return the interval to wait after a cycle described by ``report``."""
+        if not self.adaptive:
+            return self.interval
+        if report.quota is not None and report.quota < QUOTA_LOW:
+            logger.warning(
+                "Only %.0f%% of the API rate-limit quota is left; slowing down",
+                report.quota * 100,
+            )
+            return min(self.interval * 2, self.max_interval)
+        if report.busy:
+            return self.min_interval
+        return min(self.interval * 2, self.max_interval)
+
+    def _spread(self, interval: float) -> float:
+        """Return ``interval`` with jitter applied."""
+        if not self.jitter:
+            return interval
+        return interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _observe_interval(self) -> None:
+        """Export the current interval when metrics are enabled."""
+        if self.metrics is not None:
+            self.metrics.interval.set(self.interval)
+
+    def _handle_signal(self, signum: int, _frame: object) -> None:
+        """Signal handler that requests a graceful shutdown."""
+        logger.info("Received %s, shutting down", signal.Signals(signum).name)
+        self.stop()
+
+
+def _interval_change(previous: float, current: float) -> str:
+    """Describe an interval change for the cycle log line."""
+    if current < previous:
+        return f" (shortened from {previous:g}s)"
+    if current > previous:
+        return f" (backed off from {previous:g}s)"
+    return ""
@@ -0,0 +1,82 @@
+"""Persistent sync state used to skip reconciles when nothing changed."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict, dataclass
+from typing import Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SyncState:
+    """State remembered between sync runs."""
+
+    fingerprint: Optional[str] = None
+    last_full_sync: float = 0.0
+    cycles_since_full_sync: int = 0
+    record_count: int = 0
+    # Settings ``record_count`` was listed under; None in older state files.
+    record_scope: Optional[str] = None
+
+    @classmethod
+    def load(cls, path: str) -> "SyncState":
+        """Read state from ``path``, returning empty state if unavailable."""
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+        except FileNotFoundError:
+            return cls()
+        except (OSError, ValueError) as exc:
+            logger.warning("Ignoring unreadable state file %s: %s", path, exc)
+            return cls()
+
+        return cls(
+            fingerprint=data.get("fingerprint"),
+            last_full_sync=float(data.get("last_full_sync", 0.0)),
+            cycles_since_full_sync=int(data.get("cycles_since_full_sync", 0)),
+            record_count=int(data.get("record_count", 0)),
+            record_scope=data.get("record_scope"),
+        )
+
+    def save(self, path: str) -> None:
+        """Atomically write state to ``path``."""
+        write_json_atomic(path, asdict(self))
+
+
+def write_json_atomic(path: str, data: object) -> None:
+    """Write JSON to a temporary file and rename it over ``path``."""
+    write_text_atomic(path, json.dumps(data, separators=(",", ":")))
+
+
+def write_text_atomic(path: str, text: str) -> None:
+    """Write text to a temporary file and rename it over ``path``."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tsync-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as handle:
+            handle.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def mapping_fingerprint(mappings: Mapping[str, object], **settings: object) -> str:
+    """Return a stable hash of device mappings and the settings behind them."""
+    payload = json.dumps(
+        {"mappings": mappings, "settings": settings},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
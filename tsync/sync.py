@@ -2,14 +2,46 @@
 
 from __future__ import annotations
 
+import cProfile
 import logging
-from typing import Dict, List, Optional, Tuple
+import pstats
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
 
-from .cloudflare import CloudflareAPI
-from .tailscale import TailscaleAPI
+import requests
+
+from .applier import ApplyResult, PlanApplier
+from .cache import RecordCache
+from .cloudflare import CloudflareAPI, RecordChange
+from .filters import DeviceFilter, compile_filter
+from .governor import ChangeGovernor
+from .journal import JournalEntry, WriteJournal
+from .plan import (
+    RecordIndex,
+    RecordKey,
+    SyncPlan,
+    build_plan,
+    desired_address_records,
+    desired_records,
+)
+from .planfile import StalePlanError, read_plan, split_plan, write_plan
+from .state import SyncState, mapping_fingerprint, write_text_atomic
+from .tailscale import AddressMappings, TailscaleAPI
+from .tracing import current_span, span
+from .zonefile import render_zone
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+    from .tracing import Span, Tracer
 
 logger = logging.getLogger(__name__)
 
+# Only one cProfile profiler can be active per process, so profiled syncs of
+# concurrent targets take turns.
+_PROFILE_LOCK = threading.Lock()
+
 
 class DNSSync:
     """Synchronize Tailscale devices into Cloudflare DNS records."""
@@ -18,9 +50,61 @@ class DNSSync:
         self,
         tailscale_api: TailscaleAPI,
         cloudflare_api: CloudflareAPI,
+        concurrency: int = 1,
+        state_path: Optional[str] = None,
+        full_sync_interval: float = 3600,
+        full_sync_cycles: int = 0,
+        metrics: Optional["Metrics"] = None,
+        governor: Optional[ChangeGovernor] = None,
+        tracer: Optional["Tracer"] = None,
+        profile_path: Optional[str] = None,
+        journal_path: Optional[str] = None,
+        max_write_attempts: int = 5,
+        record_cache: bool = False,
+        cache_path: Optional[str] = None,
     ) -> None:
         self.tailscale = tailscale_api
         self.cloudflare = cloudflare_api
+        self.applier = PlanApplier(cloudflare_api, concurrency)
+        self.state_path = state_path
+        self.full_sync_interval = full_sync_interval
+        self.full_sync_cycles = full_sync_cycles
+        self.metrics = metrics
+        self.governor = governor or ChangeGovernor()
+        self.tracer = tracer
+        self.profile_path = profile_path
+        self._profile: Optional[pstats.Stats] = None
+        self.journal = (
+            WriteJournal.load(journal_path, max_write_attempts)
+            if journal_path
+            else None
+        )
+        # Journaled writes given up on since the last take_abandoned().
+        self.abandoned: List[JournalEntry] = []
+        # Set when a write is given up on, so the next sync reconciles fully
+        # instead of trusting an unchanged fingerprint.
+        self._reconcile_due = False
+        # Record writes attempted so far, failed ones included.
+        self.write_count = 0
+        # The settings that decide which records a listing returns.
+        self.listing_scope = mapping_fingerprint(
+            {},
+            zone_id=cloudflare_api.zone_id,
+            base_domain=cloudflare_api.base_domain,
+            create_wildcard_records=cloudflare_api.create_wildcard_records,
+            record_types=cloudflare_api.record_types,
+            owner=cloudflare_api.owner_comment,
+            adopt_unmarked=cloudflare_api.adopt_unmarked,
+        )
+        self.cache: Optional[RecordCache] = None
+        if record_cache or cache_path:
+            scope = self.listing_scope
+            self.cache = (
+                RecordCache.load(scope, cache_path)
+                if cache_path
+                else RecordCache(scope)
+            )
+        self._lock = threading.Lock()
 
     def sync(
         self,
@@ -28,121 +112,767 @@ class DNSSync:
         tags_filter: Optional[List[str]] = None,
         skip_offline: bool = False,
         dry_run: bool = False,
+        device_filter: Optional[DeviceFilter] = None,
+        bootstrap: bool = False,
+        zone_file: Optional[str] = None,
+        plan_out: Optional[str] = None,
     ) -> Tuple[int, int, int]:
-        """Synchronize device mappings and return counts of created/updated/deleted."""
+        """
+        Synchronize device mappings and return counts of created/updated/deleted.
+
+        ``device_filter`` takes precedence over the name, tag and offline
+        arguments, which are kept for callers that do not compile a filter.
+        With ``bootstrap``, planned creations are uploaded in one zone import
+        instead of record by record; ``zone_file`` saves the imported zone.
+        ``plan_out`` saves the planned changes for ``apply_plan``.
+        """
+        if device_filter is None:
+            device_filter = compile_filter(
+                None, name_pattern, tags_filter, skip_offline
+            )
+        with self._lock, span(
+            self.tracer,
+            "sync",
+            base_domain=self.cloudflare.base_domain,
+        ) as current:
+            args = (device_filter, dry_run, bootstrap, zone_file, plan_out)
+            if self.profile_path is None:
+                counts = self._sync(*args)
+            else:
+                counts = self._profiled(self._sync, *args)
+            current.set(created=counts[0], updated=counts[1], deleted=counts[2])
+            return counts
+
+    def _sync(
+        self,
+        device_filter: DeviceFilter,
+        dry_run: bool,
+        bootstrap: bool = False,
+        zone_file: Optional[str] = None,
+        plan_out: Optional[str] = None,
+    ) -> Tuple[int, int, int]:
+        """Run a full synchronization; callers must hold the sync lock."""
         logger.info("Starting DNS synchronization.")
 
-        tailscale_devices = self.tailscale.get_device_mappings(
-            name_pattern=name_pattern,
-            tags_filter=tags_filter,
-            skip_offline=skip_offline,
+        state = SyncState.load(self.state_path) if self.state_path else None
+        full_sync_due = (
+            bootstrap
+            or plan_out is not None
+            or state is None
+            or self._full_sync_due(state)
         )
 
-        if not tailscale_devices:
+        # Without a fingerprint to compare against, the Cloudflare listing is
+        # needed anyway, so fetch it alongside the Tailscale devices. A warm
+        # record cache stands in for the listing until a resync is due.
+        cached = None if bootstrap or plan_out else self._cached_index()
+        tailscale_devices, index = self._fetch(
+            device_filter,
+            list_records=full_sync_due and cached is None,
+        )
+
+        if not any(tailscale_devices.values()):
             logger.warning("No matching devices found in Tailscale.")
             return 0, 0, 0
 
-        dns_records = self.cloudflare.get_dns_records("A")
-        dns_mapping: Dict[str, Dict[str, str]] = {}
-        wildcard_mapping: Dict[str, Dict[str, str]] = {}
+        # Failed writes from earlier runs go first, before the fingerprint
+        # check, since an unchanged device list says nothing about them.
+        replayed: Set[str] = set()
+        retried = ApplyResult()
+        retry_deferred = 0
+        if self.journal and not dry_run:
+            replayed, retried, retry_deferred = self._replay_journal(
+                tailscale_devices
+            )
+        if self._reconcile_due:
+            full_sync_due = True
+
+        fingerprint = mapping_fingerprint(
+            tailscale_devices,
+            device_filter=device_filter.source,
+            base_domain=self.cloudflare.base_domain,
+            create_wildcard_records=self.cloudflare.create_wildcard_records,
+            record_types=self.cloudflare.record_types,
+            owner=self.cloudflare.owner_comment,
+        )
+        if state is not None and not full_sync_due and state.fingerprint == fingerprint:
+            logger.info(
+                "Device mappings unchanged since the last full sync; "
+                "skipping Cloudflare reconcile",
+            )
+            if not dry_run:
+                state.cycles_since_full_sync += 1
+                state.save(self.state_path)
+            return retried.counts
 
-        for record in dns_records:
-            name = record["name"]
-            if not name.endswith(f".{self.cloudflare.base_domain}"):
-                continue
+        if cached is not None and index is None:
+            assert self.cache is not None
+            index = cached
+            self.cache.cycles += 1
+            logger.info(
+                "Planning against %s cached records listed %.0fs ago",
+                len(index),
+                self.cache.age(),
+            )
+        else:
+            if index is None:
+                index, _ = self._timed_listing()
+            self.governor.check_listing(len(index), self._previous_count(state))
+            if self.cache is not None:
+                self.cache.replace(index)
+                if retried.results:
+                    # The listing ran before the journaled writes landed.
+                    self.cache.invalidate("journaled writes changed the zone")
+                if not dry_run:
+                    self.cache.save()
 
-            hostname = name.replace(f".{self.cloudflare.base_domain}", "")
-            record_info = {
-                "id": record["id"],
-                "content": record["content"],
-                "full_name": name,
-            }
+        started = time.monotonic()
+        with span(self.tracer, "plan") as current:
+            desired = desired_address_records(
+                tailscale_devices,
+                self.cloudflare.base_domain,
+                self.cloudflare.create_wildcard_records,
+            )
+            plan = build_plan(desired, index)
+            current.set(
+                desired=len(desired),
+                existing=len(index),
+                creates=len(plan.creates),
+                updates=len(plan.updates),
+                deletes=len(plan.deletes),
+            )
+        self._observe_phase("plan", time.monotonic() - started)
+        if replayed:
+            plan = _without_names(plan, replayed)
 
-            if hostname.startswith("*."):
-                wildcard_mapping[hostname[2:]] = record_info
-            else:
-                dns_mapping[hostname] = record_info
-
-        created = updated = deleted = 0
-
-        for hostname, ip in tailscale_devices.items():
-            full_name = f"{hostname}.{self.cloudflare.base_domain}"
-            wildcard_name = f"*.{hostname}.{self.cloudflare.base_domain}"
-
-            if hostname in dns_mapping:
-                current_ip = dns_mapping[hostname]["content"]
-                if current_ip != ip:
-                    logger.info("Updating %s: %s -> %s", hostname, current_ip, ip)
-                    if dry_run:
-                        updated += 1
-                    elif self.cloudflare.update_dns_record(
-                        dns_mapping[hostname]["id"],
-                        full_name,
-                        ip,
-                    ):
-                        updated += 1
-                else:
-                    logger.debug("No change required for %s", hostname)
-                dns_mapping.pop(hostname, None)
-            else:
-                logger.info("Creating DNS record for %s -> %s", hostname, ip)
-                if dry_run:
-                    created += 1
-                elif self.cloudflare.create_dns_record(full_name, ip):
-                    created += 1
-
-            if self.cloudflare.create_wildcard_records:
-                if hostname in wildcard_mapping:
-                    current_ip = wildcard_mapping[hostname]["content"]
-                    if current_ip != ip:
-                        logger.info(
-                            "Updating wildcard *.%s: %s -> %s",
-                            hostname,
-                            current_ip,
-                            ip,
-                        )
-                        if dry_run:
-                            updated += 1
-                        elif self.cloudflare.update_dns_record(
-                            wildcard_mapping[hostname]["id"],
-                            wildcard_name,
-                            ip,
-                        ):
-                            updated += 1
-                    wildcard_mapping.pop(hostname, None)
-                else:
-                    logger.info(
-                        "Creating wildcard DNS record for *.%s -> %s",
-                        hostname,
-                        ip,
-                    )
-                    if dry_run:
-                        created += 1
-                    elif self.cloudflare.create_dns_record(wildcard_name, ip):
-                        created += 1
-
-        for hostname, record_info in dns_mapping.items():
-            logger.info("Deleting DNS record for stale device %s", hostname)
-            if dry_run:
-                deleted += 1
-            elif self.cloudflare.delete_dns_record(record_info["id"], hostname):
-                deleted += 1
-
-        if self.cloudflare.create_wildcard_records:
-            for hostname, record_info in wildcard_mapping.items():
-                logger.info("Deleting wildcard DNS record for stale device *.%s", hostname)
-                if dry_run:
-                    deleted += 1
-                elif self.cloudflare.delete_dns_record(
-                    record_info["id"],
-                    f"*.{hostname}",
-                ):
-                    deleted += 1
+        imported = 0
+        index_size = len(index)
+        if bootstrap and plan.creates:
+            verified = self._bootstrap(plan, zone_file, dry_run)
+            if verified is not None:
+                # Whatever the import missed is applied record by record.
+                remaining = build_plan(desired, verified)
+                imported = len(plan.creates) - len(remaining.creates)
+                index_size = len(verified) - imported
+                logger.info(
+                    "Listing confirmed %s of %s imported records",
+                    imported,
+                    len(plan.creates),
+                )
+                plan = remaining
+
+        plan, deferred = self._govern(plan, index_size, dry_run)
+        deferred += retry_deferred
+        if plan_out:
+            write_plan(
+                plan_out,
+                plan,
+                self.cloudflare.zone_id,
+                self.cloudflare.base_domain,
+                self.cloudflare.owner_comment,
+            )
+            logger.info("Wrote %s planned changes to %s", len(plan), plan_out)
+        outcome = self._apply(plan, dry_run)
+        created = outcome.created + retried.created + imported
+        updated = outcome.updated + retried.updated
+        deleted = outcome.deleted + retried.deleted
+
+        if state is not None and not dry_run:
+            # A failed or deferred write leaves drift behind, so only remember
+            # the fingerprint when the zone is known to match the devices.
+            # Journaled failures are retried even when the fingerprint
+            # matches, so they do not force another full reconcile. Writes
+            # given up on are no longer retried, so the next run must
+            # reconcile fully to bring them back.
+            journaled = self.journal is not None
+            converged = (journaled or not outcome.failed) and not deferred
+            if self._reconcile_due:
+                logger.info("Full reconcile is due next run after abandoned writes")
+                converged = False
+                self._reconcile_due = False
+            state.fingerprint = fingerprint if converged else None
+            state.last_full_sync = time.time()
+            state.cycles_since_full_sync = 0
+            state.record_count = index_size + created - deleted
+            state.record_scope = self.listing_scope
+            state.save(self.state_path)
 
         logger.info(
-            "Sync complete: %s created, %s updated, %s deleted",
+            "Sync complete: %s created, %s updated, %s deleted, %s deferred",
             created,
             updated,
             deleted,
+            deferred,
         )
         return created, updated, deleted
+
+    def sync_device(
+        self,
+        device_id: str,
+        device_name: Optional[str] = None,
+        deleted: bool = False,
+        name_pattern: Optional[str] = None,
+        tags_filter: Optional[List[str]] = None,
+        skip_offline: bool = False,
+        dry_run: bool = False,
+        device_filter: Optional[DeviceFilter] = None,
+    ) -> Tuple[int, int, int]:
+        """
+        Reconcile the records of a single device and its wildcard.
+
+        The device is fetched on its own and only records with its exact
+        names are looked up, so no full listing is needed. Deleted or
+        filtered-out devices have their records removed, as are records of
+        types the device no longer has an address for.
+        """
+        record_types = self.cloudflare.record_types
+        with self._lock, span(self.tracer, "sync_device", device=device_id):
+            found = None
+            if not deleted:
+                found = self.tailscale.get_device_address(
+                    device_id,
+                    name_pattern=name_pattern,
+                    tags_filter=tags_filter,
+                    skip_offline=skip_offline,
+                    device_filter=device_filter,
+                    record_types=record_types,
+                )
+
+            addresses: Dict[str, str] = {}
+            if found:
+                hostname, addresses = found
+            elif device_name:
+                hostname = TailscaleAPI.hostname_for(device_name)
+            else:
+                logger.warning("Cannot resolve a hostname for device %s", device_id)
+                return 0, 0, 0
+
+            logger.info(
+                "Reconciling device %s (%s)",
+                hostname,
+                ", ".join(addresses.values()) or "absent",
+            )
+            desired: Dict[RecordKey, Optional[str]] = {}
+            for record_type in record_types:
+                for key in desired_records(
+                    {hostname: ""},
+                    self.cloudflare.base_domain,
+                    self.cloudflare.create_wildcard_records,
+                    record_type,
+                ):
+                    desired[key] = addresses.get(record_type)
+
+            # One lookup per name covers every managed type.
+            index = self._new_index(include_wildcards=True)
+            for name in dict.fromkeys(name for name, _ in desired):
+                index.add_all(
+                    self.cloudflare.find_dns_records(name, self._listing_type()),
+                    self.cloudflare.owns,
+                )
+
+            plan, _ = self._govern(
+                build_plan(desired, index, prune=False),
+                None,
+                dry_run,
+            )
+            return self._apply(plan, dry_run).counts
+
+    def apply_plan(self, path: str, dry_run: bool = False) -> Tuple[int, int, int]:
+        """
+        Apply a plan saved with ``plan_out`` without listing the zone.
+
+        Only the names the plan touches are looked up. Changes already in
+        effect are skipped, so a partly applied plan can be run again. If any
+        touched record differs from what the plan expects, nothing is
+        applied and ``StalePlanError`` is raised.
+        """
+        saved = read_plan(path)
+        cloudflare = self.cloudflare
+        planned_for = (saved.zone_id, saved.base_domain, saved.owner)
+        if planned_for != (
+            cloudflare.zone_id,
+            cloudflare.base_domain,
+            cloudflare.owner_comment,
+        ):
+            raise ValueError(
+                f"{path} was planned for {saved.base_domain} in zone "
+                f"{saved.zone_id} (owner {saved.owner}), not for this target"
+            )
+
+        with self._lock, span(
+            self.tracer,
+            "apply_plan",
+            changes=len(saved.plan),
+        ) as current:
+            logger.info(
+                "Applying %s changes planned at %s from %s",
+                len(saved.plan),
+                saved.created,
+                path,
+            )
+            plan, applied = self._check_plan(saved.plan)
+            if applied:
+                logger.info("Skipping %s changes already in effect", applied)
+            plan, _ = self._govern(plan, None, dry_run)
+            outcome = self._apply(plan, dry_run)
+            current.set(skipped=applied, failed=outcome.failed)
+
+            if self.state_path and plan and not dry_run:
+                # The zone moved without a device fingerprint to go with it.
+                state = SyncState.load(self.state_path)
+                state.fingerprint = None
+                state.save(self.state_path)
+            return outcome.counts
+
+    def _check_plan(self, plan: SyncPlan) -> Tuple[SyncPlan, int]:
+        """
+        Compare a saved plan with the current records it touches.
+
+        Returns the changes still to apply and how many are already in
+        effect, or raises ``StalePlanError`` listing every conflict.
+        """
+        current: Dict[RecordKey, List[Dict]] = {}
+        for name in dict.fromkeys(change.name for change in plan.changes):
+            for record in self.cloudflare.find_dns_records(name, self._listing_type()):
+                if self.cloudflare.owns(record) is not False:
+                    key = (record["name"], record["type"])
+                    current.setdefault(key, []).append(record)
+
+        pending: List[RecordChange] = []
+        conflicts: List[str] = []
+        applied = 0
+        for change in plan.changes:
+            records = current.get((change.name, change.record_type), [])
+            found = next(
+                (record for record in records if record["id"] == change.record_id),
+                None,
+            )
+            if change.action == "create":
+                if not records:
+                    pending.append(change)
+                elif any(record["content"] == change.content for record in records):
+                    applied += 1
+                else:
+                    conflicts.append(
+                        f"create {change.name}: exists with {records[0]['content']}"
+                    )
+            elif found is None:
+                if change.action == "delete":
+                    applied += 1
+                else:
+                    conflicts.append(f"update {change.name}: record is gone")
+            elif found["content"] == change.previous_content:
+                pending.append(change)
+            elif change.action == "update" and found["content"] == change.content:
+                applied += 1
+            else:
+                conflicts.append(
+                    f"{change.action} {change.name}: expected "
+                    f"{change.previous_content}, found {found['content']}"
+                )
+
+        if conflicts:
+            for conflict in conflicts:
+                logger.error("Plan conflict: %s", conflict)
+            raise StalePlanError(
+                f"{len(conflicts)} planned change(s) no longer match the zone; "
+                "plan again with --plan-out"
+            )
+        return split_plan(pending), applied
+
+    def take_abandoned(self) -> List[JournalEntry]:
+        """Return and clear the writes given up on since the last call."""
+        with self._lock:
+            abandoned, self.abandoned = self.abandoned, []
+            return abandoned
+
+    def _replay_journal(
+        self,
+        devices: AddressMappings,
+    ) -> Tuple[Set[str], ApplyResult, int]:
+        """
+        Retry journaled writes against fresh lookups of their names.
+
+        Each journaled name is looked up on its own and re-planned against
+        the current devices, so an entry that was applied in the meantime or
+        is no longer wanted is dropped instead of replayed. Returns the names
+        handled, the outcome and the number of deferred changes.
+        """
+        journal = self.journal
+        assert journal is not None
+        names = journal.names()
+        logger.info("Retrying %s journaled writes first", len(journal))
+        with span(self.tracer, "journal_replay", entries=len(journal)) as current:
+            wanted = desired_address_records(
+                devices,
+                self.cloudflare.base_domain,
+                self.cloudflare.create_wildcard_records,
+            )
+            desired: Dict[RecordKey, Optional[str]] = {}
+            index = self._new_index(include_wildcards=True)
+            for name in names:
+                index.add_all(
+                    self.cloudflare.find_dns_records(name, self._listing_type()),
+                    self.cloudflare.owns,
+                )
+                for record_type in self.cloudflare.record_types:
+                    desired[(name, record_type)] = wanted.get((name, record_type))
+            plan = build_plan(desired, index, prune=False)
+
+            planned = {(change.name, change.record_type) for change in plan.changes}
+            obsolete = journal.discard(set(journal.entries) - planned)
+            for entry in obsolete:
+                logger.info("Dropping obsolete journaled write: %s", entry.describe())
+            if obsolete:
+                journal.save()
+
+            plan, deferred = self._govern(plan, None, False)
+            outcome = self._apply(plan, False)
+            current.set(
+                obsolete=len(obsolete),
+                retried=len(plan),
+                failed=outcome.failed,
+            )
+        return set(names), outcome, deferred
+
+    def _fetch(
+        self,
+        device_filter: DeviceFilter,
+        list_records: bool,
+    ) -> Tuple[AddressMappings, Optional[RecordIndex]]:
+        """
+        Fetch Tailscale devices, and optionally the Cloudflare records too.
+
+        The two reads hit different services, so the listing runs on a
+        worker thread while the devices are fetched. A failure on either side
+        propagates before anything is written.
+        """
+        started = time.monotonic()
+        if not list_records:
+            devices = self._get_addresses(device_filter)
+            tailscale_seconds = time.monotonic() - started
+            self._observe_devices(devices, tailscale_seconds)
+            logger.info(
+                "Fetched %s Tailscale devices in %.2fs",
+                _host_count(devices),
+                tailscale_seconds,
+            )
+            return devices, None
+
+        with ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="tsync-list",
+        ) as executor:
+            listing = executor.submit(
+                self._timed_listing,
+                current_span(self.tracer),
+            )
+            devices = self._get_addresses(device_filter)
+            tailscale_seconds = time.monotonic() - started
+            self._observe_devices(devices, tailscale_seconds)
+            index, cloudflare_seconds = listing.result()
+
+        wall = time.monotonic() - started
+        logger.info(
+            "Fetched %s Tailscale devices in %.2fs and %s Cloudflare records "
+            "in %.2fs concurrently (%.2fs wall, %.2fs saved)",
+            _host_count(devices),
+            tailscale_seconds,
+            len(index),
+            cloudflare_seconds,
+            wall,
+            max(tailscale_seconds + cloudflare_seconds - wall, 0.0),
+        )
+        return devices, index
+
+    def _get_addresses(self, device_filter: DeviceFilter) -> AddressMappings:
+        """Fetch the filtered device addresses for every managed type."""
+        with span(self.tracer, "tailscale_fetch", filter=device_filter.source):
+            return self.tailscale.get_device_addresses(
+                device_filter=device_filter,
+                record_types=self.cloudflare.record_types,
+            )
+
+    def _timed_listing(
+        self,
+        parent: Optional["Span"] = None,
+    ) -> Tuple[RecordIndex, float]:
+        """List managed records and return them with the elapsed time."""
+        started = time.monotonic()
+        with span(self.tracer, "cloudflare_list", parent) as current:
+            index = self._list_records()
+            current.set(records=len(index))
+        elapsed = time.monotonic() - started
+        self._observe_phase("cloudflare_list", elapsed)
+        return index, elapsed
+
+    def _bootstrap(
+        self,
+        plan: SyncPlan,
+        zone_file: Optional[str],
+        dry_run: bool,
+    ) -> Optional[RecordIndex]:
+        """
+        Import the planned creations as one zone file, then list once.
+
+        Returns the index from the verification listing, or None when
+        nothing was imported (dry runs and failed imports) so the plan is
+        applied as usual.
+        """
+        with span(self.tracer, "bootstrap", records=len(plan.creates)):
+            return self._import(plan, zone_file, dry_run)
+
+    def _import(
+        self,
+        plan: SyncPlan,
+        zone_file: Optional[str],
+        dry_run: bool,
+    ) -> Optional[RecordIndex]:
+        """Render, save and upload the zone for ``_bootstrap``."""
+        zone = render_zone(
+            plan.creates,
+            comment=self.cloudflare.owner_comment,
+            origin=self.cloudflare.base_domain,
+        )
+        if zone_file:
+            write_text_atomic(zone_file, zone)
+            logger.info("Wrote %s records to %s", len(plan.creates), zone_file)
+        if dry_run:
+            logger.info("Dry run: would import %s records", len(plan.creates))
+            return None
+
+        started = time.monotonic()
+        try:
+            result = self.cloudflare.import_zone(zone)
+        except (requests.exceptions.RequestException, ValueError) as exc:
+            logger.warning("Zone import failed, creating records one by one: %s", exc)
+            return None
+        self._observe_phase("import", time.monotonic() - started)
+        logger.info(
+            "Imported %s of %s records in %.2fs",
+            result.get("recs_added"),
+            result.get("total_records_parsed"),
+            time.monotonic() - started,
+        )
+        if self.metrics is not None:
+            self.metrics.changes.inc(
+                float(result.get("recs_added") or 0),
+                action="create",
+                result="success",
+            )
+
+        index, _ = self._timed_listing()
+        if self.cache is not None:
+            self.cache.replace(index)
+            self.cache.save()
+        return index
+
+    def _govern(
+        self,
+        plan: SyncPlan,
+        existing: Optional[int],
+        dry_run: bool,
+    ) -> Tuple[SyncPlan, int]:
+        """Trim ``plan`` to the write budget; return it and the deferred count."""
+        with span(self.tracer, "govern") as current:
+            governed = self.governor.govern(plan, existing)
+            current.set(deferred=len(governed.deferred))
+        if self.metrics is not None and not dry_run:
+            for change in governed.deferred.changes:
+                self.metrics.deferred.inc(action=change.action)
+        return governed.allowed, len(governed.deferred)
+
+    def _apply(self, plan: SyncPlan, dry_run: bool) -> ApplyResult:
+        """Apply ``plan`` and record its duration and outcome."""
+        started = time.monotonic()
+        with span(self.tracer, "apply", changes=len(plan), dry_run=dry_run) as current:
+            outcome = self.applier.apply(plan, dry_run)
+            current.set(failed=outcome.failed)
+        self._observe_phase("apply", time.monotonic() - started)
+        if not dry_run:
+            self.governor.record(len(outcome.results))
+            self.write_count += len(outcome.results)
+        if self.journal is not None and not dry_run:
+            self._journal(outcome)
+        if self.cache is not None and not dry_run:
+            self._update_cache(outcome)
+        if self.metrics is not None and not dry_run:
+            for change, ok in outcome.results:
+                self.metrics.changes.inc(
+                    action=change.action,
+                    result="success" if ok else "failure",
+                )
+        return outcome
+
+    def _journal(self, outcome: ApplyResult) -> None:
+        """Journal failed writes, clear successful ones and drop poison entries."""
+        journal = self.journal
+        assert journal is not None
+        errors: Dict[RecordKey, str] = {}
+        for change, ok in outcome.results:
+            if not ok:
+                key = (change.name, change.record_type)
+                errors[key] = self.cloudflare.last_errors.pop(key, "")
+        changed = journal.record(outcome.results, errors)
+        if outcome.failed:
+            logger.warning(
+                "Journaled %s failed writes for the next run",
+                outcome.failed,
+            )
+        abandoned = journal.give_up()
+        for entry in abandoned:
+            logger.error("Giving up on DNS write: %s", entry.describe())
+        self.abandoned.extend(abandoned)
+        if abandoned:
+            self._reconcile_due = True
+        if changed or abandoned:
+            journal.save()
+
+    def _update_cache(self, outcome: ApplyResult) -> None:
+        """Write applied changes through to the record cache."""
+        cache = self.cache
+        assert cache is not None
+        cloudflare = self.cloudflare
+        conflicts = [
+            change.name
+            for change, ok in outcome.results
+            if not ok and change.name in cloudflare.conflicts
+        ]
+        cloudflare.conflicts.difference_update(conflicts)
+        if conflicts:
+            cache.invalidate(f"the zone no longer matched for {conflicts[0]}")
+            cache.save()
+        elif cache.update(outcome.results, cloudflare.created_ids):
+            cache.save()
+        for change, ok in outcome.results:
+            if change.action == "create":
+                cloudflare.created_ids.pop((change.name, change.record_type), None)
+
+    def _cached_index(self) -> Optional[RecordIndex]:
+        """Return the cached records as an index, or None if a listing is due."""
+        cache = self.cache
+        if cache is None or cache.stale:
+            return None
+        if cache.age() >= self.full_sync_interval:
+            logger.info("Record cache is due for a full resync")
+            return None
+        if self.full_sync_cycles and cache.cycles + 1 >= self.full_sync_cycles:
+            logger.info("Record cache is due for a full resync")
+            return None
+        return cache.fill(
+            self._new_index(include_wildcards=self.cloudflare.create_wildcard_records)
+        )
+
+    def _observe_devices(self, devices: AddressMappings, seconds: float) -> None:
+        """Record the Tailscale fetch duration and filtered device count."""
+        self._observe_phase("tailscale_fetch", seconds)
+        if self.metrics is not None:
+            self.metrics.devices.set(
+                _host_count(devices),
+                tailnet=self.tailscale.tailnet,
+            )
+
+    def _observe_phase(self, phase: str, seconds: float) -> None:
+        """Record the duration of a sync phase when metrics are enabled."""
+        if self.metrics is not None:
+            self.metrics.phase_duration.observe(seconds, phase=phase)
+
+    def _list_records(self) -> RecordIndex:
+        """Index every managed record under the base domain in one listing."""
+        return self._new_index(
+            include_wildcards=self.cloudflare.create_wildcard_records,
+        ).add_all(
+            self.cloudflare.iter_dns_records(
+                self._listing_type(),
+                name_suffix=f".{self.cloudflare.base_domain}",
+            ),
+            self.cloudflare.owns,
+        )
+
+    def _new_index(self, include_wildcards: bool) -> RecordIndex:
+        """Return an empty index for the managed record types."""
+        return RecordIndex(
+            self.cloudflare.base_domain,
+            include_wildcards=include_wildcards,
+            record_types=frozenset(self.cloudflare.record_types),
+        )
+
+    def _listing_type(self) -> Optional[str]:
+        """
+        Return the type filter for listings, or None for every type.
+
+        The API filters by a single type, so managing several types lists
+        the base domain unfiltered and lets the index drop other types.
+        """
+        record_types = self.cloudflare.record_types
+        return record_types[0] if len(record_types) == 1 else None
+
+    def _profiled(
+        self,
+        func: Callable[..., Tuple[int, int, int]],
+        *args: Any,
+    ) -> Tuple[int, int, int]:
+        """Run ``func`` under cProfile, adding to the stats in ``profile_path``."""
+        profiler = cProfile.Profile()
+        with _PROFILE_LOCK:
+            try:
+                return profiler.runcall(func, *args)
+            finally:
+                if self._profile is None:
+                    self._profile = pstats.Stats(profiler)
+                else:
+                    self._profile.add(profiler)
+                self._profile.dump_stats(self.profile_path)
+                logger.info(
+                    "Profile written to %s (view with: python -m pstats %s)",
+                    self.profile_path,
+                    self.profile_path,
+                )
+
+    def _previous_count(self, state: Optional[SyncState]) -> Optional[int]:
+        """
+        Return the managed record count of the last full sync, if comparable.
+
+        A count listed under other settings (owner, base domain, record
+        types) says nothing about the current listing and is ignored.
+        """
+        if state is None:
+            return None
+        if state.record_scope not in (None, self.listing_scope):
+            if state.record_count:
+                logger.info(
+                    "Listing settings changed since the last full sync; "
+                    "not comparing against its %s records",
+                    state.record_count,
+                )
+            return None
+        return state.record_count
+
+    def _full_sync_due(self, state: SyncState) -> bool:
+        """Return True when the saved state cannot justify skipping a reconcile."""
+        if state.fingerprint is None:
+            return True
+        if time.time() - state.last_full_sync >= self.full_sync_interval:
+            logger.info("Full reconcile is due after %ss", self.full_sync_interval)
+            return True
+        due_cycles = state.cycles_since_full_sync + 1 >= self.full_sync_cycles
+        if self.full_sync_cycles and due_cycles:
+            logger.info("Full reconcile is due after %s cycles", self.full_sync_cycles)
+            return True
+        return False
+
+
+def _host_count(addresses: AddressMappings) -> int:
+    """Return how many distinct hostnames have an address of any type."""
+    if len(addresses) == 1:
+        return len(next(iter(addresses.values())))
+    return len(set().union(*addresses.values()))
+
+
+def _without_names(plan: SyncPlan, names: Set[str]) -> SyncPlan:
+    """Return ``plan`` without the changes to records named in ``names``."""
+
+    def keep(changes: Tuple[RecordChange, ...]) -> Tuple[RecordChange, ...]:
+        return tuple(change for change in changes if change.name not in names)
+
+    return SyncPlan(keep(plan.creates), keep(plan.updates), keep(plan.deletes))
@@ -3,93 +3,217 @@
 from __future__ import annotations
 
 import logging
-import re
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 import requests
 
+from .devices import Device, hostname_for, iter_devices
+from .filters import DeviceFilter, DevicePredicate, compile_filter
+from .tracing import span
+from .transport import HTTPTransport
+
 logger = logging.getLogger(__name__)
 
+# Record type -> hostname -> address, as published in DNS.
+AddressMappings = Dict[str, Dict[str, str]]
+
+# The device list is streamed in chunks of this many bytes.
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 class TailscaleAPI:
     """Client wrapper for the Tailscale REST API."""
 
     base_url = "https://api.tailscale.com/api/v2"
 
-    def __init__(self, api_key: str, tailnet: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        tailnet: str,
+        transport: Optional[HTTPTransport] = None,
+    ) -> None:
         self.api_key = api_key
         self.tailnet = tailnet
+        self.transport = transport or HTTPTransport()
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         }
 
-    def get_devices(self) -> List[Dict]:
-        """Return all devices listed in the configured tailnet."""
+    def get_devices(self) -> List[Device]:
+        """
+        Return all devices listed in the configured tailnet.
+
+        The response is streamed and parsed device by device into compact
+        records, so the raw JSON is never held in memory as a whole.
+        """
         url = f"{self.base_url}/tailnet/{self.tailnet}/devices"
 
+        tracer = self.transport.tracer
         try:
-            response = requests.get(url, headers=self.headers, timeout=15)
-            response.raise_for_status()
-        except requests.exceptions.RequestException as exc:
+            with span(tracer, "tailscale.devices") as current, self.transport.get(
+                url,
+                api="tailscale",
+                endpoint="devices",
+                headers=self.headers,
+                params={"fields": "default"},
+                stream=True,
+                timeout=15,
+            ) as response:
+                response.raise_for_status()
+                chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                if tracer is None:
+                    return list(iter_devices(chunks))
+                received = [0]
+                devices = list(iter_devices(_counted(chunks, received)))
+                current.set(devices=len(devices), bytes=received[0])
+                return devices
+        except (requests.exceptions.RequestException, ValueError) as exc:
             logger.error("Failed to retrieve devices from Tailscale: %s", exc)
             return []
 
-        data = response.json()
-        return data.get("devices", [])
+    def get_device(self, device_id: str) -> Optional[Device]:
+        """
+        Return a single device, or None if it does not exist.
+
+        Unlike ``get_devices`` request failures are raised, because callers
+        reconcile a single name and must not mistake an error for a deletion.
+        """
+        url = f"{self.base_url}/device/{device_id}"
+
+        response = self.transport.get(
+            url,
+            api="tailscale",
+            endpoint="device",
+            headers=self.headers,
+            timeout=15,
+        )
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+
+        return Device.from_api(response.json())
 
     def get_device_mappings(
         self,
         name_pattern: Optional[str] = None,
         tags_filter: Optional[List[str]] = None,
         skip_offline: bool = False,
+        device_filter: Optional[DeviceFilter] = None,
     ) -> Dict[str, str]:
         """
         Build a mapping of device hostname to IPv4 address.
 
-        The mapping only includes devices that match the optional filters.
+        The mapping only includes devices that match ``device_filter``, or
+        the legacy name, tag and online filters when it is not given.
         """
-        devices = self.get_devices()
-        mappings: Dict[str, str] = {}
-
-        name_regex = re.compile(name_pattern) if name_pattern else None
+        return self.get_device_addresses(
+            name_pattern,
+            tags_filter,
+            skip_offline,
+            device_filter,
+            record_types=("A",),
+        )["A"]
+
+    def get_device_addresses(
+        self,
+        name_pattern: Optional[str] = None,
+        tags_filter: Optional[List[str]] = None,
+        skip_offline: bool = False,
+        device_filter: Optional[DeviceFilter] = None,
+        record_types: Sequence[str] = ("A",),
+    ) -> AddressMappings:
+        """
+        Map each record type to the hostnames and addresses to publish.
 
-        for device in devices:
-            if skip_offline and not device.get("online", False):
-                logger.debug(
-                    "Skipping offline device %s",
-                    device.get("hostname", "unknown"),
+        Devices are filtered as in ``get_device_mappings`` and listed under
+        every type they have an address for, e.g. ``{"A": {...}, "AAAA": {...}}``.
+        """
+        devices = self.get_devices()
+        addresses: AddressMappings = {record_type: {} for record_type in record_types}
+        predicate = _predicate(device_filter, name_pattern, tags_filter, skip_offline)
+
+        matched = 0
+        with span(self.transport.tracer, "filter") as current:
+            for device in devices:
+                found = self._device_addresses(device, predicate, record_types)
+                if not found:
+                    continue
+                matched += 1
+                for record_type, address in found.items():
+                    addresses[record_type][device.hostname] = address
+                logger.info(
+                    "Discovered device %s -> %s",
+                    device.hostname,
+                    ", ".join(found.values()),
                 )
-                continue
+            current.set(devices=len(devices), matched=matched)
 
-            hostname = device.get("hostname", "").lower()
-            device_name = device.get("name", "")
+        logger.debug("%s of %s devices passed the filters", matched, len(devices))
+        return addresses
 
-            if device_name and "." in device_name:
-                hostname = device_name.split(".")[0].lower()
-            elif not hostname:
-                hostname = device.get("hostname", "").lower()
-
-            addresses = device.get("addresses", [])
-            if not hostname or not addresses:
-                continue
-
-            if name_regex and not name_regex.match(hostname):
-                continue
+    def get_device_address(
+        self,
+        device_id: str,
+        name_pattern: Optional[str] = None,
+        tags_filter: Optional[List[str]] = None,
+        skip_offline: bool = False,
+        device_filter: Optional[DeviceFilter] = None,
+        record_types: Sequence[str] = ("A",),
+    ) -> Optional[Tuple[str, Dict[str, str]]]:
+        """
+        Return one device's hostname and addresses by record type.
 
-            if tags_filter:
-                device_tags = [tag.lower() for tag in device.get("tags", [])]
-                if not any(tag.lower() in device_tags for tag in tags_filter):
-                    continue
+        None is returned when the device is missing, filtered out or has no
+        address of the requested types.
+        """
+        device = self.get_device(device_id)
+        if device is None:
+            return None
 
-            tailscale_ip = None
-            for addr in addresses:
-                if ":" not in addr and addr.startswith("100."):
-                    tailscale_ip = addr
-                    break
+        predicate = _predicate(device_filter, name_pattern, tags_filter, skip_offline)
+        found = self._device_addresses(device, predicate, record_types)
+        return (device.hostname, found) if found else None
 
-            if tailscale_ip:
-                mappings[hostname] = tailscale_ip
-                logger.info("Discovered device %s -> %s", hostname, tailscale_ip)
+    @staticmethod
+    def hostname_for(device_name: str) -> str:
+        """Return the DNS label tsync uses for a MagicDNS device name."""
+        return hostname_for(device_name)
 
-        return mappings
+    def _device_addresses(
+        self,
+        device: Device,
+        predicate: DevicePredicate,
+        record_types: Sequence[str],
+    ) -> Dict[str, str]:
+        """Return a device's addresses by record type, or {} if filtered out."""
+        if not device.hostname:
+            return {}
+        found = {
+            record_type: address
+            for record_type in record_types
+            if (address := device.address(record_type))
+        }
+        if found and not predicate(device):
+            logger.debug("Skipping filtered device %s", device.hostname)
+            return {}
+        return found
+
+
+def _predicate(
+    device_filter: Optional[DeviceFilter],
+    name_pattern: Optional[str],
+    tags_filter: Optional[List[str]],
+    skip_offline: bool,
+) -> DevicePredicate:
+    """Return the filter predicate, compiling the legacy settings if needed."""
+    if device_filter is None:
+        device_filter = compile_filter(None, name_pattern, tags_filter, skip_offline)
+    return device_filter.predicate()
+
+
+def _counted(chunks: Iterable[bytes], received: List[int]) -> Iterator[bytes]:
+    """Pass ``chunks`` through, adding their sizes to ``received[0]``."""
+    for chunk in chunks:
+        received[0] += len(chunk)
+        yield chunk
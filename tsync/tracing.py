@@ -0,0 +1,200 @@
+"""Lightweight span tracing of sync runs, written as JSON span trees."""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Record, zone and device IDs collapsed when turning URLs into templates.
+_ID_SEGMENT = re.compile(r"/(?:[0-9a-f]{32}|\d+|n[0-9A-Za-z]{8,})(?=/|$)")
+
+
+class Span:
+    """A timed operation with attributes and child spans."""
+
+    __slots__ = ("name", "attributes", "start", "end", "thread", "children")
+
+    def __init__(self, name: str, attributes: Dict[str, Any]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+        self.children: List["Span"] = []
+
+    def set(self, **attributes: Any) -> None:
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        """Return the span tree with times in milliseconds from ``origin``."""
+        end = self.end if self.end is not None else time.perf_counter()
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((end - self.start) * 1000, 3),
+            "thread": self.thread,
+        }
+        if self.attributes:
+            data["attributes"] = self.attributes
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class _SpanContext:
+    """Context manager opening a span on entry and closing it on exit."""
+
+    __slots__ = ("tracer", "name", "parent", "attributes", "span")
+
+    def __init__(
+        self,
+        tracer: "Tracer",
+        name: str,
+        parent: Optional[Span],
+        attributes: Dict[str, Any],
+    ) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer.start(self.name, self.parent, **self.attributes)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc is not None:
+            self.span.set(error=f"{exc_type.__name__}: {exc}")
+        self.tracer.finish(self.span)
+
+
+class _NullSpan:
+    """Stand-in returned when tracing is off; every operation is a no-op."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        return None
+
+    def set(self, **attributes: Any) -> None:
+        """Ignore attributes."""
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collect spans into per-thread trees.
+
+    Spans nest under the innermost open span of the same thread, or under
+    an explicit ``parent`` handed to a worker thread. A span opened on a
+    worker thread with neither attaches to the oldest open root span, so
+    work fanned out from a run stays inside that run's tree.
+    """
+
+    def __init__(self) -> None:
+        self.roots: List[Span] = []
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self._open_roots: List[Span] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def span(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        **attributes: Any,
+    ) -> _SpanContext:
+        """Return a context manager timing ``name``."""
+        return _SpanContext(self, name, parent, attributes)
+
+    def current(self) -> Optional[Span]:
+        """Return the innermost open span of the calling thread."""
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def start(
+        self,
+        name: str,
+        parent: Optional[Span] = None,
+        **attributes: Any,
+    ) -> Span:
+        """Open a span; pair with ``finish``."""
+        span = Span(name, attributes)
+        stack = self._stack()
+        with self._lock:
+            if stack or parent is not None:
+                (stack[-1] if stack else parent).children.append(span)
+            elif self._open_roots:
+                self._open_roots[0].children.append(span)
+            else:
+                self.roots.append(span)
+                self._open_roots.append(span)
+        stack.append(span)
+        return span
+
+    def finish(self, span: Span, **attributes: Any) -> None:
+        """Close ``span``, adding ``attributes``."""
+        span.end = time.perf_counter()
+        if attributes:
+            span.attributes.update(attributes)
+        stack = self._stack()
+        if span in stack:
+            del stack[stack.index(span) :]
+        with self._lock:
+            if span in self._open_roots:
+                self._open_roots.remove(span)
+
+    def flush(self, path: str) -> None:
+        """Append the finished trees to ``path`` as one JSON line and reset."""
+        with self._lock:
+            roots, self.roots = self.roots, list(self._open_roots)
+            origin, started_at = self.origin, self.started_at
+            self.origin = time.perf_counter()
+            self.started_at = time.time()
+        trace = {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(started_at)),
+            "spans": [span.to_dict(origin) for span in roots if span.end is not None],
+        }
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(trace, separators=(",", ":"), default=str))
+            handle.write("\n")
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+
+def span(
+    tracer: Optional[Tracer],
+    name: str,
+    parent: Optional[Span] = None,
+    **attributes: Any,
+) -> Any:
+    """Return ``tracer.span(...)``, or a shared no-op when tracing is off."""
+    if tracer is None:
+        return NULL_SPAN
+    return tracer.span(name, parent, **attributes)
+
+
+def current_span(tracer: Optional[Tracer]) -> Optional[Span]:
+    """Return the calling thread's innermost span, to parent worker spans."""
+    return tracer.current() if tracer is not None else None
+
+
+def url_template(url: str) -> str:
+    """Return the path of ``url`` with record, zone and device IDs collapsed."""
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/") :] if "/" in path else "/"
+    return _ID_SEGMENT.sub("/{id}", path.split("?", 1)[0])
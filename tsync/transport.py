@@ -0,0 +1,390 @@
+"""Shared HTTP transport with pooled sessions, retries and rate limiting."""
+
+from __future__ import annotations
+
+import logging
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Dict, FrozenSet, Mapping, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from .tracing import url_template
+
+if TYPE_CHECKING:
+    from .metrics import Metrics
+    from .tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES: FrozenSet[int] = frozenset({429, 500, 502, 503, 504})
+
+# Methods that can be repeated without changing the outcome (RFC 9110).
+# Others, such as the POSTs creating records and leases, are retried only
+# when the server cannot have acted on the first attempt.
+IDEMPOTENT_METHODS: FrozenSet[str] = frozenset(
+    {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+)
+
+# Cloudflare allows 1200 requests per five minutes for each API token.
+CLOUDFLARE_RATE_LIMIT = 1200 / 300
+CLOUDFLARE_RATE_BURST = 20
+
+# ``r=`` (remaining) and ``q=`` (quota) parameters of the structured
+# ``RateLimit`` and ``RateLimit-Policy`` headers.
+_RATELIMIT_PARAM = re.compile(r"\b([rq])=(\d+)")
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting how fast requests are sent."""
+
+    def __init__(self, rate: float, burst: float = 1.0) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available; return the wait."""
+        if self.rate <= 0:
+            return 0.0
+
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.burst,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+
+class HTTPTransport:
+    """
+    Pooled ``requests`` session shared by all API clients.
+
+    Connections are kept alive per host, failed requests are retried with
+    jittered exponential backoff (honouring ``Retry-After``), and hosts can
+    be given a token-bucket rate limiter. When ``metrics`` is set, every
+    attempt is recorded under the ``api`` and ``endpoint`` labels supplied
+    by the calling client; when ``tracer`` is set, each attempt is a span.
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 60.0,
+        pool_size: int = 10,
+        retry_statuses: FrozenSet[int] = RETRY_STATUSES,
+        metrics: Optional["Metrics"] = None,
+        tracer: Optional["Tracer"] = None,
+    ) -> None:
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+        self.metrics = metrics
+        self.tracer = tracer
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._limiters: Dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+        self.requests_sent = 0
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self._quota: Dict[str, float] = {}
+
+    def limit_host(self, url: str, limiter: RateLimiter) -> None:
+        """Apply ``limiter`` to every request sent to the host of ``url``."""
+        self._limiters[urlparse(url).netloc] = limiter
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        api: str = "",
+        endpoint: str = "",
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Send a request, retrying transient failures.
+
+        The final response is returned even when its status is an error, so
+        callers keep using ``raise_for_status``. Connection errors are raised
+        once the retries are exhausted. Non-idempotent methods are retried
+        only after a 429 or a failure to connect, since the server may have
+        applied an attempt that timed out or failed with a 5xx.
+        """
+        host = urlparse(url).netloc
+        limiter = self._limiters.get(host)
+        metrics = self.metrics
+        tracer = self.tracer
+        api = api or host
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            if limiter is not None:
+                waited = limiter.acquire()
+                if waited:
+                    with self._lock:
+                        self.rate_limit_wait += waited
+                    if metrics is not None:
+                        metrics.rate_limit_wait.inc(waited, api=api)
+
+            with self._lock:
+                self.requests_sent += 1
+
+            if tracer is not None:
+                span = tracer.start(
+                    "http",
+                    api=api,
+                    endpoint=endpoint,
+                    method=method,
+                    url=url_template(url),
+                    attempt=attempt,
+                )
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as exc:
+                if tracer is not None:
+                    tracer.finish(span, error=str(exc))
+                if metrics is not None:
+                    self._observe(api, endpoint, method, "error", started)
+                if attempt >= self.max_retries or not (
+                    idempotent or not_sent(exc)
+                ):
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(
+                    "%s %s failed (%s), retrying in %.1fs",
+                    method,
+                    url,
+                    exc,
+                    delay,
+                )
+            else:
+                if tracer is not None:
+                    tracer.finish(
+                        span,
+                        status=response.status_code,
+                        bytes=_response_size(response, kwargs.get("stream", False)),
+                    )
+                if metrics is not None:
+                    self._observe(
+                        api, endpoint, method, response.status_code, started
+                    )
+                self._note_quota(api, response)
+                if (
+                    response.status_code not in self.retry_statuses
+                    or attempt >= self.max_retries
+                    or not (idempotent or response.status_code == 429)
+                ):
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    "%s %s returned HTTP %s, retrying in %.1fs",
+                    method,
+                    url,
+                    response.status_code,
+                    delay,
+                )
+                response.close()
+
+            with self._lock:
+                self.retries += 1
+            if metrics is not None:
+                metrics.api_retries.inc(api=api, endpoint=endpoint)
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """Send a GET request."""
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """Send a POST request."""
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        """Send a PUT request."""
+        return self.request("PUT", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        """Send a PATCH request."""
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        """Send a DELETE request."""
+        return self.request("DELETE", url, **kwargs)
+
+    def take_quota(self) -> Dict[str, float]:
+        """
+        Return and reset the lowest share of rate-limit quota left, by API.
+
+        Shares come from the rate-limit headers of responses since the last
+        call; a 429 counts as an exhausted quota. APIs that sent no such
+        headers are absent.
+        """
+        with self._lock:
+            quota, self._quota = self._quota, {}
+        return quota
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Return per-host request, connection and reuse counters."""
+        stats: Dict[str, Dict[str, int]] = {}
+        for adapter in {id(a): a for a in self.session.adapters.values()}.values():
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                host = stats.setdefault(
+                    pool.host,
+                    {"requests": 0, "connections": 0, "reused": 0},
+                )
+                host["requests"] += pool.num_requests
+                host["connections"] += pool.num_connections
+                host["reused"] += max(pool.num_requests - pool.num_connections, 0)
+        return stats
+
+    def log_stats(self) -> None:
+        """Log connection reuse and retry statistics."""
+        for host, counters in sorted(self.stats().items()):
+            logger.info(
+                "HTTP %s: %s requests over %s connections (%s reused)",
+                host,
+                counters["requests"],
+                counters["connections"],
+                counters["reused"],
+            )
+        if self.retries or self.rate_limit_wait:
+            logger.info(
+                "HTTP retries: %s, rate-limit wait: %.2fs",
+                self.retries,
+                self.rate_limit_wait,
+            )
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        self.session.close()
+
+    def _observe(
+        self,
+        api: str,
+        endpoint: str,
+        method: str,
+        status: object,
+        started: float,
+    ) -> None:
+        """Record one request attempt in the metrics registry."""
+        elapsed = time.perf_counter() - started
+        self.metrics.api_requests.inc(
+            api=api, endpoint=endpoint, method=method, status=status
+        )
+        self.metrics.api_latency.observe(elapsed, api=api, endpoint=endpoint)
+
+    def _note_quota(self, api: str, response: requests.Response) -> None:
+        """Remember the share of quota ``response`` reports as remaining."""
+        if response.status_code == 429:
+            share: Optional[float] = 0.0
+        else:
+            share = _quota_share(response.headers)
+        if share is not None:
+            with self._lock:
+                self._quota[api] = min(share, self._quota.get(api, 1.0))
+
+    def _backoff(self, attempt: int) -> float:
+        """Return a full-jitter exponential backoff delay."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2**attempt))
+        return random.uniform(0, ceiling)
+
+    def _retry_after(self, response: requests.Response) -> Optional[float]:
+        """Parse a ``Retry-After`` header into seconds, if present."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            delay = retry_at.timestamp() - time.time()
+        return min(max(delay, 0.0), self.backoff_max)
+
+
+def _response_size(response: requests.Response, stream: bool) -> Optional[int]:
+    """Return the body size of ``response`` without consuming a stream."""
+    length = response.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    return None if stream else len(response.content)
+
+
+def not_sent(exc: requests.exceptions.RequestException) -> bool:
+    """Return True when ``exc`` shows the request never reached the server."""
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = exc.args[0] if exc.args else None
+    # Failed connections surface as a urllib3 MaxRetryError with a reason.
+    reason = getattr(reason, "reason", reason)
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def _quota_share(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Return the share of rate-limit quota left according to ``headers``.
+
+    Understands ``X-RateLimit-Remaining``/``-Limit``, the draft IETF
+    ``RateLimit-Remaining``/``-Limit`` pair and the structured ``RateLimit``
+    (``r=``) and ``RateLimit-Policy`` (``q=``) headers sent by Cloudflare.
+    """
+    remaining = headers.get("X-RateLimit-Remaining") or headers.get(
+        "RateLimit-Remaining"
+    )
+    limit = headers.get("X-RateLimit-Limit") or headers.get("RateLimit-Limit")
+    if remaining is None or limit is None:
+        remaining = _ratelimit_param(headers.get("RateLimit"), "r")
+        limit = _ratelimit_param(headers.get("RateLimit-Policy"), "q")
+    try:
+        left = float(str(remaining).split(",")[0].split(";")[0])
+        total = float(str(limit).split(",")[0].split(";")[0])
+    except ValueError:
+        return None
+    if total <= 0:
+        return None
+    return min(max(left / total, 0.0), 1.0)
+
+
+def _ratelimit_param(value: Optional[str], key: str) -> Optional[str]:
+    """Return parameter ``key`` of a structured rate-limit header."""
+    for match in _RATELIMIT_PARAM.finditer(value or ""):
+        if match.group(1) == key:
+            return match.group(2)
+    return None
@@ -0,0 +1,218 @@
+"""Receiver for Tailscale webhook events driving per-device syncs."""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = "Tailscale-Webhook-Signature"
+
+# Events that remove a device; every other node event triggers a refresh.
+DELETE_EVENTS = frozenset({"nodeDeleted"})
+
+
+@dataclass(frozen=True)
+class DeviceEvent:
+    """A webhook event reduced to the device it concerns."""
+
+    event_type: str
+    device_id: str
+    device_name: Optional[str]
+    tailnet: Optional[str] = None
+
+    @property
+    def deleted(self) -> bool:
+        """Return True when the event removes the device."""
+        return self.event_type in DELETE_EVENTS
+
+
+def verify_signature(
+    secret: str,
+    header: Optional[str],
+    body: bytes,
+    tolerance: float = 300,
+    now: Optional[float] = None,
+) -> bool:
+    """
+    Check a ``Tailscale-Webhook-Signature`` header against the body.
+
+    The header carries ``t=<unix time>,v1=<hex HMAC-SHA256>`` where the HMAC
+    covers ``"<t>.<body>"``. Stale timestamps are rejected to stop replays.
+    """
+    if not header:
+        return False
+
+    parts = dict(
+        item.split("=", 1) for item in header.split(",") if "=" in item
+    )
+    timestamp, signature = parts.get("t"), parts.get("v1")
+    if not timestamp or not signature:
+        return False
+
+    try:
+        age = abs((now if now is not None else time.time()) - int(timestamp))
+    except ValueError:
+        return False
+    if age > tolerance:
+        return False
+
+    expected = hmac.new(
+        secret.encode("utf-8"),
+        timestamp.encode("utf-8") + b"." + body,
+        hashlib.sha256,
+    ).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def parse_events(body: bytes) -> List[DeviceEvent]:
+    """Extract device events from a webhook payload."""
+    payload = json.loads(body or b"[]")
+    if isinstance(payload, dict):
+        payload = [payload]
+
+    events: List[DeviceEvent] = []
+    for item in payload:
+        data = item.get("data") or {}
+        device_id = data.get("nodeID") or data.get("nodeId")
+        if not device_id:
+            logger.debug("Ignoring webhook event %s", item.get("type"))
+            continue
+        events.append(
+            DeviceEvent(
+                event_type=item.get("type", ""),
+                device_id=device_id,
+                device_name=data.get("deviceName"),
+                tailnet=item.get("tailnet"),
+            )
+        )
+    return events
+
+
+class WebhookServer:
+    """
+    HTTP listener accepting signed Tailscale webhook deliveries.
+
+    A delivery is accepted when its signature matches any of ``secrets``, so
+    one listener can serve webhooks from several tailnets. Requests are
+    acknowledged as soon as they are verified; the events are handed to
+    ``handler`` one at a time on a worker thread.
+    """
+
+    def __init__(
+        self,
+        secrets: Sequence[str],
+        handler: Callable[[DeviceEvent], None],
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        tolerance: float = 300,
+    ) -> None:
+        self.secrets = list(secrets)
+        self.handler = handler
+        self.tolerance = tolerance
+        self._events: "queue.Queue[Optional[DeviceEvent]]" = queue.Queue()
+        self._httpd = ThreadingHTTPServer((host, port), self._request_handler())
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def server_address(self) -> Tuple[str, int]:
+        """Return the bound host and port."""
+        host, port = self._httpd.server_address[:2]
+        return str(host), int(port)
+
+    def start(self) -> None:
+        """Start serving and processing events in background threads."""
+        self._threads = [
+            threading.Thread(
+                target=self._httpd.serve_forever,
+                name="tsync-webhook",
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._process_events,
+                name="tsync-webhook-worker",
+                daemon=True,
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info("Listening for Tailscale webhooks on %s:%s", *self.server_address)
+
+    def stop(self) -> None:
+        """Stop accepting requests and wait for queued events to finish."""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._events.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _process_events(self) -> None:
+        """Hand queued events to the handler until stopped."""
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                self.handler(event)
+            except Exception as exc:  # pylint: disable=broad-except
+                logger.error(
+                    "Failed to handle %s for device %s: %s",
+                    event.event_type,
+                    event.device_id,
+                    exc,
+                )
+
+    def _request_handler(self) -> type:
+        """Build the request handler class bound to this server."""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Verify deliveries and queue their events."""
+
+            def do_POST(self) -> None:  # noqa: N802
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+
+                header = self.headers.get(SIGNATURE_HEADER)
+                if not any(
+                    verify_signature(secret, header, body, tolerance=server.tolerance)
+                    for secret in server.secrets
+                ):
+                    logger.warning("Rejected webhook with an invalid signature")
+                    self._respond(401)
+                    return
+
+                try:
+                    events = parse_events(body)
+                except (ValueError, AttributeError) as exc:
+                    logger.warning("Rejected malformed webhook payload: %s", exc)
+                    self._respond(400)
+                    return
+
+                for event in events:
+                    logger.info(
+                        "Received %s for device %s",
+                        event.event_type,
+                        event.device_name or event.device_id,
+                    )
+                    server._events.put(event)
+                self._respond(200)
+
+            def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+                logger.debug("Webhook %s - %s", self.address_string(), format % args)
+
+            def _respond(self, status: int) -> None:
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+        return Handler
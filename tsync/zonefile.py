@@ -0,0 +1,37 @@
+"""Rendering planned records as a BIND zone fragment for bulk import."""
+
+from __future__ import annotations
+
+import time
+from typing import Iterable, List, Optional
+
+from .cloudflare import RecordChange
+
+# TTL written for imported records; matches the per-record API calls.
+ZONE_TTL = 300
+
+
+def render_zone(
+    changes: Iterable[RecordChange],
+    comment: Optional[str] = None,
+    origin: Optional[str] = None,
+) -> str:
+    """
+    Render record creations as BIND zone file lines.
+
+    Names are written fully qualified, so the fragment does not depend on
+    ``$ORIGIN``; ``origin`` only labels the header. Cloudflare's importer
+    stores the text after ``;`` on a record line as the record comment,
+    which carries ``comment`` (the ownership marker) over to the records.
+    """
+    lines: List[str] = [
+        f"; tsync bootstrap for {origin or 'zone'} generated "
+        f"{time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}",
+    ]
+    suffix = f" ; {comment}" if comment else ""
+    for change in changes:
+        lines.append(
+            f"{change.name}.\t{ZONE_TTL}\tIN\t{change.record_type}\t"
+            f"{change.content}{suffix}"
+        )
+    return "\n".join(lines) + "\n"